@@ -0,0 +1,70 @@
+"""Generate courses in bulk from a JSONL manifest.
+
+Usage (from backend/):
+    python batch.py manifest.jsonl --parallel 8 --report report.jsonl
+
+Each line of the manifest is {"description": "...", "level": "..."}.
+Identical requests (after normalising case and whitespace) are
+generated once. Re-running the same manifest, or passing --batch-id,
+resumes the batch: courses that already succeeded are skipped. Sections
+are written together when a course finishes, but each one is cached as
+soon as it is generated, so an interrupted course keeps its outline and
+takes the sections it already generated from the response cache.
+"""
+import argparse
+import json
+import os
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="JSONL file, or - for stdin")
+    parser.add_argument("--parallel", type=int, default=None, help="courses generated at once (BATCH_PARALLELISM)")
+    parser.add_argument("--batch-id", help="resume or name a batch; defaults to a hash of the manifest contents")
+    parser.add_argument("--report", help="write one JSON line per item to this file")
+    args = parser.parse_args()
+
+    # This process only runs the batch; queued web jobs and database sweeps are left to the server.
+    os.environ.setdefault("JOB_WORKERS", "0")
+    os.environ.setdefault("DB_SWEEP_INTERVAL", "0")
+    from core.batch import parse_manifest
+    from main import create_app, services
+
+    # The app is created so that progress events reach clients through the Socket.IO message queue.
+    create_app()
+    batch_runner = services.batch_runner
+
+    source = sys.stdin if args.manifest == "-" else open(args.manifest)
+    with source:
+        entries, errors = parse_manifest(source)
+    for error in errors:
+        print(f"line {error['line']}: skipped ({error['error']})", file=sys.stderr)
+    if not entries:
+        print("No valid entries in manifest.", file=sys.stderr)
+        return 1
+
+    batch = batch_runner.create_batch(entries, batch_id=args.batch_id)
+    print(f"batch {batch['batch_id']}: {batch['entries']} entries, {batch['unique']} unique, "
+          f"{batch['duplicates']} duplicates")
+
+    def on_result(result, done, total):
+        status = result["status"]
+        detail = result.get("course_id") if status == "succeeded" else result.get("error")
+        print(f"[{done}/{total}] line {result['line']}: {status} in {result['duration_ms'] / 1000:.1f}s ({detail})")
+
+    summary = batch_runner.run(batch["batch_id"], parallelism=args.parallel, on_result=on_result)
+    print(f"{summary['succeeded']} succeeded, {summary['failed']} failed in {summary['elapsed_s']:.1f}s "
+          f"({summary['courses_per_minute']:.1f} courses/min)")
+
+    if args.report:
+        report = batch_runner.get_report(batch["batch_id"])
+        with open(args.report, "w") as f:
+            for item in report["items"]:
+                f.write(json.dumps(item) + "\n")
+        print(f"report written to {args.report}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
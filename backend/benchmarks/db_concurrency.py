@@ -0,0 +1,117 @@
+"""Read throughput of the REST queries while course generation is writing.
+
+Usage (from backend/):
+    python -m benchmarks.db_concurrency --readers 8 --duration 5
+
+Runs the same workload once per journal mode and prints reads/s for the
+/courses, /sections and /analytics queries with and without a concurrent
+writer inserting sections.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+
+def build_database(db_path, journal_mode):
+    os.environ["DB_PATH"] = db_path
+    os.environ["DB_JOURNAL_MODE"] = journal_mode
+    from core.database.db import Database
+    return Database()
+
+
+def seed(db, courses, sections_per_course, content_size):
+    course_ids = []
+    content = "x" * content_size
+    for _ in range(courses):
+        course_id = str(uuid.uuid4())
+        session_id = str(uuid.uuid4())
+        db.create_session(session_id, [], "seed", "beginner", "success")
+        db.create_course(course_id, session_id, "Seed course", "seed", "beginner", int(time.time()))
+        for order in range(sections_per_course):
+            db.create_section(str(uuid.uuid4()), course_id, f"Section {order}", "seed", content, order, int(time.time()))
+        course_ids.append(course_id)
+    return course_ids
+
+
+def run_readers(db, course_ids, readers, duration, writer=None):
+    stop = threading.Event()
+    counts = [0] * readers
+    errors = []
+
+    def reader(index):
+        i = 0
+        try:
+            while not stop.is_set():
+                db.get_all_courses()
+                db.get_all_sections_for_course(course_ids[i % len(course_ids)])
+                if i % 10 == 0:
+                    db.get_analytics_data()
+                i += 1
+                counts[index] += 1
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    writer_thread = threading.Thread(target=writer, args=(stop,)) if writer else None
+    for thread in threads:
+        thread.start()
+    if writer_thread:
+        writer_thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    if writer_thread:
+        writer_thread.join()
+    return sum(counts) / duration, errors
+
+
+def make_writer(db, course_ids, content_size, write_interval, writes):
+    content = "y" * content_size
+
+    def writer(stop):
+        i = 0
+        while not stop.is_set():
+            course_id = course_ids[i % len(course_ids)]
+            db.create_section(str(uuid.uuid4()), course_id, "Generated", "bench", content, 1000 + i, int(time.time()))
+            writes[0] += 1
+            i += 1
+            if write_interval:
+                time.sleep(write_interval)
+
+    return writer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--courses", type=int, default=50)
+    parser.add_argument("--sections", type=int, default=10)
+    parser.add_argument("--content-size", type=int, default=8000)
+    parser.add_argument("--write-interval", type=float, default=0.002)
+    parser.add_argument("--modes", default="WAL,DELETE")
+    args = parser.parse_args()
+
+    for journal_mode in args.modes.split(","):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = build_database(os.path.join(tmp, "bench.db"), journal_mode)
+            course_ids = seed(db, args.courses, args.sections, args.content_size)
+
+            idle_rate, idle_errors = run_readers(db, course_ids, args.readers, args.duration)
+            writes = [0]
+            writer = make_writer(db, course_ids, args.content_size, args.write_interval, writes)
+            busy_rate, busy_errors = run_readers(db, course_ids, args.readers, args.duration, writer)
+
+            print(f"[{journal_mode}] readers={args.readers}")
+            print(f"  idle:          {idle_rate:10.1f} reads/s")
+            print(f"  while writing: {busy_rate:10.1f} reads/s ({writes[0] / args.duration:.1f} writes/s)")
+            if idle_errors or busy_errors:
+                print(f"  errors: {len(idle_errors) + len(busy_errors)} (first: {(idle_errors + busy_errors)[0]!r})")
+
+
+if __name__ == "__main__":
+    main()
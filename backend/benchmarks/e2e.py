@@ -0,0 +1,269 @@
+"""End-to-end benchmark against the fake LLM backend.
+
+Usage (from backend/):
+    python -m benchmarks.e2e --courses 20 --concurrency 4 --latency-ms 200
+    python -m benchmarks.e2e --label after-change --compare benchmarks/results/<previous>.json
+
+Loads the app with LLM_BACKEND=fake on a throwaway database. It then:
+  1. starts courses through the /create namespace and times each one
+     until its session reports success;
+  2. hammers the REST routes from several threads and reports
+     requests/s and latency per route;
+  3. reports per-method Database timings collected across both phases.
+
+Results are written to benchmarks/results/ as JSON. --compare prints
+the change against an earlier run.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+TOPICS = ["Python generators", "SQL window functions", "Rust ownership", "Kubernetes networking", "Linear algebra"]
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": pick(50) * 1000,
+        "p90_ms": pick(90) * 1000,
+        "p99_ms": pick(99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+class QueryTimer:
+    def __init__(self, db):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+        for name in dir(db):
+            method = getattr(db, name)
+            if name.startswith("_") or not callable(method):
+                continue
+            setattr(db, name, self._wrap(name, method))
+
+    def _wrap(self, name, method):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.samples[name].append(elapsed)
+        return timed
+
+    def report(self):
+        with self._lock:
+            return {name: percentiles(samples) for name, samples in sorted(self.samples.items())}
+
+
+def run_creations(app, socketio, courses, concurrency, stream, timeout):
+    client = socketio.test_client(app, namespace="/create")
+    run_token = uuid.uuid4().hex[:8]
+    started = {}
+    first_update = {}
+    finished = {}
+    failed = {}
+    pending = []
+    for i in range(courses):
+        session_id = str(uuid.uuid4())
+        description = f"Create a course about {TOPICS[i % len(TOPICS)]} ({run_token}-{i})"
+        pending.append((session_id, description))
+
+    deadline = time.perf_counter() + timeout
+    while (pending or len(finished) + len(failed) < len(started)) and time.perf_counter() < deadline:
+        in_flight = len(started) - len(finished) - len(failed)
+        while pending and in_flight < concurrency:
+            session_id, description = pending.pop(0)
+            started[session_id] = time.perf_counter()
+            client.emit("start_creation", {
+                "session_id": session_id, "description": description, "level": "beginner", "stream": stream
+            }, namespace="/create")
+            in_flight += 1
+
+        for message in client.get_received("/create"):
+            payload = message["args"][0] if message["args"] else {}
+            session_id = payload.get("session_id")
+            if session_id not in started:
+                continue
+            now = time.perf_counter()
+            if message["name"] == "error":
+                failed[session_id] = payload.get("error")
+            elif message["name"] in ("session_update", "session_delta"):
+                first_update.setdefault(session_id, now)
+                if payload.get("progress") == "success":
+                    finished[session_id] = now
+                elif payload.get("progress") == "error":
+                    failed[session_id] = "progress=error"
+        time.sleep(0.005)
+
+    client.disconnect(namespace="/create")
+    return {
+        "started": len(started),
+        "succeeded": len(finished),
+        "failed": len(failed),
+        "timed_out": len(started) - len(finished) - len(failed) + len(pending),
+        "first_update": percentiles([first_update[s] - started[s] for s in first_update]),
+        "creation": percentiles([finished[s] - started[s] for s in finished]),
+    }
+
+
+def rest_routes(db):
+    courses = db.get_all_courses(fields=["course_id"])
+    course_id = courses[0]["course_id"] if courses else "missing"
+    return {
+        "/courses": "/courses",
+        "/courses?limit=50": "/courses?limit=50&fields=course_id,title",
+        "/course": f"/course?id={course_id}",
+        "/sections": f"/sections?course_id={course_id}",
+        "/sections?fields": f"/sections?course_id={course_id}&fields=section_id,title,is_completed",
+        "/search": "/search?q=course",
+        "/analytics": "/analytics",
+    }
+
+
+def run_rest(app, routes, threads, duration):
+    stop = threading.Event()
+    samples = defaultdict(list)
+    errors = defaultdict(int)
+    lock = threading.Lock()
+    names = list(routes)
+
+    def worker(index):
+        client = app.test_client()
+        i = index
+        while not stop.is_set():
+            name = names[i % len(names)]
+            start = time.perf_counter()
+            response = client.get(routes[name])
+            elapsed = time.perf_counter() - start
+            with lock:
+                if response.status_code >= 400:
+                    errors[name] += 1
+                samples[name].append(elapsed)
+            i += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in workers:
+        thread.join()
+
+    return {
+        name: {**percentiles(samples[name]), "rps": len(samples[name]) / duration, "errors": errors[name]}
+        for name in names
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous, path=()):
+    for key, value in current.items():
+        old = previous.get(key) if isinstance(previous, dict) else None
+        if isinstance(value, dict):
+            compare(value, old or {}, path + (key,))
+        elif key.endswith("_ms") or key == "rps":
+            if isinstance(old, (int, float)) and old:
+                change = (value - old) / old * 100
+                print(f"  {'.'.join(path + (key,)):60} {old:10.2f} -> {value:10.2f} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--courses", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--sections", type=int, default=5)
+    parser.add_argument("--section-chars", type=int, default=4000)
+    parser.add_argument("--rest-threads", type=int, default=8)
+    parser.add_argument("--rest-duration", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="quip-bench-")
+    os.environ.update({
+        "LLM_BACKEND": "fake",
+        "DB_PATH": os.path.join(tmp, "bench.db"),
+        "FAKE_LLM_LATENCY_MS": str(args.latency_ms),
+        "FAKE_LLM_JITTER_MS": str(args.jitter_ms),
+        "FAKE_LLM_SECTIONS": str(args.sections),
+        "FAKE_LLM_SECTION_CHARS": str(args.section_chars),
+    })
+    import main as server
+
+    app = server.create_app()
+    timer = QueryTimer(server.services.db)
+    started = time.perf_counter()
+    creation = run_creations(app, server.socketio, args.courses, args.concurrency, args.stream, args.timeout)
+    creation["wall_s"] = time.perf_counter() - started
+    creation["courses_per_s"] = creation["succeeded"] / creation["wall_s"] if creation["wall_s"] else 0
+    rest = run_rest(app, rest_routes(server.services.db), args.rest_threads, args.rest_duration)
+    server.services.stop_background(timeout=5)
+
+    result = {
+        "label": args.label,
+        "timestamp": int(time.time()),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "creation": creation,
+        "rest": rest,
+        "database": timer.report(),
+    }
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{args.label}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"creation: {creation['succeeded']}/{creation['started']} succeeded, "
+          f"{creation['failed']} failed, {creation['timed_out']} timed out in {creation['wall_s']:.1f}s")
+    for key in ("first_update", "creation"):
+        stats = creation[key]
+        if stats:
+            print(f"  {key:13} p50={stats['p50_ms']:9.1f}ms p90={stats['p90_ms']:9.1f}ms p99={stats['p99_ms']:9.1f}ms")
+    print("rest:")
+    for name, stats in rest.items():
+        if stats.get("count"):
+            print(f"  {name:20} {stats['rps']:9.1f} req/s p50={stats['p50_ms']:7.2f}ms p99={stats['p99_ms']:7.2f}ms errors={stats['errors']}")
+    print("database (slowest p99 first):")
+    for name, stats in sorted(result["database"].items(), key=lambda item: -item[1]["p99_ms"])[:15]:
+        print(f"  {name:32} n={stats['count']:7} p50={stats['p50_ms']:7.2f}ms p99={stats['p99_ms']:7.2f}ms")
+    print(f"results written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print(f"compared with {args.compare} ({previous.get('label')}, {previous.get('revision')}):")
+        compare({"creation": creation, "rest": rest, "database": result["database"]}, previous)
+
+
+if __name__ == "__main__":
+    main()
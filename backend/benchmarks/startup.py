@@ -0,0 +1,134 @@
+"""Cold-start cost of the backend: import, create_app() and the first request.
+
+Usage (from backend/):
+    python -m benchmarks.startup --runs 10
+    python -m benchmarks.startup --label after-change --compare benchmarks/results/<previous>.json
+    python -m benchmarks.startup --importtime   # slowest imports of a single run
+
+Each run is a fresh interpreter on a throwaway database, as a new worker
+would be after a deploy. JOB_WORKERS defaults to 0, so this measures a
+REST-only process unless it is set. It reports the interpreter wall time and the
+time spent importing main, in create_app() and serving the first
+GET /courses. It also reports whether the LLM stack (agno and the Google
+client) was imported. Results are written to benchmarks/results/ as JSON.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.e2e import RESULTS_DIR, compare, git_revision, percentiles
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LLM_MODULES = ("agno", "google.genai", "google.generativeai")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+app = main.create_app()
+created = time.perf_counter()
+response = app.test_client().get("/courses?limit=20")
+served = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - started,
+    "create_app_s": created - imported,
+    "first_request_s": served - created,
+    "status": response.status_code,
+    "modules": len(sys.modules),
+    "llm_stack_loaded": any(name == prefix or name.startswith(prefix + ".") for name in sys.modules for prefix in %r),
+}))
+""" % (LLM_MODULES,)
+
+
+def probe_env(tmp):
+    env = dict(os.environ)
+    env.update({
+        "DB_PATH": os.path.join(tmp, "startup.db"),
+        "JOB_WORKERS": env.get("JOB_WORKERS", "0"),
+        "DB_SWEEP_INTERVAL": "0",
+    })
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def run_probe(env):
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    wall = time.perf_counter() - started
+    return {**json.loads(output.stdout.strip().splitlines()[-1]), "wall_s": wall}
+
+
+def slowest_imports(env, top):
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main; main.create_app()"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--importtime", action="store_true", help="print the slowest imports instead")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="quip-startup-")
+    if args.importtime:
+        for cumulative_us, self_us, name in slowest_imports(probe_env(tmp), args.top):
+            print(f"  {cumulative_us / 1000:9.1f}ms cumulative {self_us / 1000:8.1f}ms self  {name}")
+        return
+
+    # The first run creates the database and warms the bytecode cache, as a deploy would have done already.
+    env = probe_env(tmp)
+    run_probe(env)
+    runs = [run_probe(env) for _ in range(args.runs)]
+
+    timings = {key: percentiles([run[key] for run in runs]) for key in ("wall_s", "import_s", "create_app_s", "first_request_s")}
+    result = {
+        "label": args.label,
+        "timestamp": int(time.time()),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "startup": timings,
+        "modules": runs[-1]["modules"],
+        "llm_stack_loaded": any(run["llm_stack_loaded"] for run in runs),
+        "errors": sum(run["status"] != 200 for run in runs),
+    }
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-startup-{args.label}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"startup over {args.runs} runs ({result['modules']} modules loaded, "
+          f"LLM stack {'loaded' if result['llm_stack_loaded'] else 'not loaded'}, {result['errors']} errors):")
+    for name, stats in timings.items():
+        print(f"  {name:16} p50={stats['p50_ms']:8.1f}ms p90={stats['p90_ms']:8.1f}ms max={stats['max_ms']:8.1f}ms")
+    print(f"results written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print(f"compared with {args.compare} ({previous.get('label')}, {previous.get('revision')}):")
+        compare({"startup": timings}, previous)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import os
+
+from core.models import CourseOutline, CourseAuthenticator
+from core.prompts import SYSTEM_PROMPT_CONTENT, SYSTEM_PROMPT_OUTLINE
+
+VALIDATOR_DESCRIPTION = "You are a course validator. Your task is to determine if the given course request is valid or a random chat message. Respond with 'true' if it is a valid course request and 'false' if it is not."
+VALIDATOR_INSTRUCTIONS = "Please respond with 'true' or 'false'. Send true if the given text is a valid request for making a course or description of a course and false if it is not."
+
+
+def build_gemini_agents():
+    from agno.agent import Agent
+    from agno.models.google import Gemini
+
+    outline_agent = Agent(
+        model=Gemini(id=os.getenv("GEMINI_MODEL"), api_key=os.getenv("GEMINI_API_KEY")),
+        description=SYSTEM_PROMPT_OUTLINE,
+        introduction=SYSTEM_PROMPT_OUTLINE,
+        structured_outputs=True,
+        use_json_mode=True,
+        response_model= CourseOutline
+    )
+
+    course_validator = Agent(
+        model=Gemini(id=os.getenv("GEMINI_MODEL"), api_key=os.getenv("GEMINI_API_KEY")),
+        description=VALIDATOR_DESCRIPTION,
+        instructions=VALIDATOR_INSTRUCTIONS,
+        structured_outputs=True,
+        use_json_mode=True,
+        response_model= CourseAuthenticator
+    )
+
+    section_agent = Agent(
+        model=Gemini(id=os.getenv("GEMINI_MODEL"), api_key=os.getenv("GEMINI_API_KEY")),
+        description=SYSTEM_PROMPT_CONTENT,
+        introduction=SYSTEM_PROMPT_CONTENT
+    )
+    return outline_agent, course_validator, section_agent
+
+
+def build_agents(backend=None):
+    backend = backend or os.getenv("LLM_BACKEND", "gemini")
+    if backend == "gemini":
+        return build_gemini_agents()
+    if backend == "fake":
+        from core.fake_llm import build_fake_agents
+        return build_fake_agents()
+    raise ValueError(f"Unknown LLM_BACKEND '{backend}'")
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from core.cache import normalise_text
+from core.pipeline import InvalidCourseRequest
+
+logger = logging.getLogger(__name__)
+
+BATCH_NAMESPACE = uuid.UUID("5b0c4a52-8f0e-4a8e-9f5e-1c3d2b7a9e10")
+
+
+def parse_manifest(lines):
+    entries = []
+    errors = []
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            entry = json.loads(line)
+            description = entry.get("description") if isinstance(entry, dict) else None
+            if not isinstance(description, str) or not description.strip():
+                raise ValueError("missing 'description'")
+            entries.append({"line": number, "description": description, "level": str(entry.get("level") or "")})
+        except ValueError as e:
+            errors.append({"line": number, "error": str(e)})
+    return entries, errors
+
+
+def dedupe_entries(entries):
+    items = {}
+    for entry in entries:
+        key = hashlib.sha256(
+            f"{normalise_text(entry['description'])}\x1f{normalise_text(entry['level'])}".encode("utf-8")
+        ).hexdigest()
+        if key in items:
+            items[key]["duplicates"] += 1
+        else:
+            items[key] = {**entry, "item_key": key, "duplicates": 0}
+    return list(items.values())
+
+
+def make_batch_id(items) -> str:
+    digest = hashlib.sha256("\n".join(sorted(item["item_key"] for item in items)).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class BatchRunner:
+    def __init__(self, db, pipeline, parallelism=None, flush_every=None):
+        self.db = db
+        self.pipeline = pipeline
+        self.parallelism = parallelism or int(os.getenv("BATCH_PARALLELISM", "4"))
+        self.flush_every = flush_every or int(os.getenv("BATCH_FLUSH_EVERY", "20"))
+
+    def create_batch(self, entries, batch_id=None):
+        items = dedupe_entries(entries)
+        batch_id = batch_id or make_batch_id(items)
+        for item in items:
+            item["session_id"] = str(uuid.uuid5(BATCH_NAMESPACE, f"{batch_id}:{item['item_key']}"))
+        added = self.db.add_batch_items(batch_id, items)
+        return {
+            "batch_id": batch_id,
+            "entries": len(entries),
+            "unique": len(items),
+            "duplicates": len(entries) - len(items),
+            "added": added,
+        }
+
+    def _run_item(self, item):
+        started = time.perf_counter()
+        result = {"item_key": item["item_key"], "line": item["line"], "session_id": item["session_id"]}
+        try:
+            session = self.db.get_session(item["session_id"])
+            if session is None or session["progress"] != "success":
+                self.pipeline.run(item["session_id"], item["description"], item["level"], group_writes=True)
+            result["status"] = "succeeded"
+            result["course_id"] = self.db.get_course_id_for_session(item["session_id"])
+        except InvalidCourseRequest as e:
+            result.update(status="failed", error=str(e))
+        except Exception as e:
+            result.update(status="failed", error=f"{type(e).__name__}: {e}")
+        result["duration_ms"] = (time.perf_counter() - started) * 1000
+        return result
+
+    def run(self, batch_id, parallelism=None, on_result=None):
+        items = [item for item in self.db.get_batch_items(batch_id) if item["status"] != "succeeded"]
+        started = time.perf_counter()
+        summary = {"batch_id": batch_id, "attempted": len(items), "succeeded": 0, "failed": 0}
+        pending = []
+
+        with ThreadPoolExecutor(max_workers=parallelism or self.parallelism) as executor:
+            futures = [executor.submit(self._run_item, item) for item in items]
+            for done, future in enumerate(as_completed(futures), start=1):
+                result = future.result()
+                summary[result["status"]] += 1
+                pending.append(result)
+                # Item results are committed in groups rather than one transaction per course.
+                if len(pending) >= self.flush_every:
+                    self.db.update_batch_items(batch_id, pending)
+                    pending = []
+                if on_result:
+                    on_result(result, done, len(items))
+        if pending:
+            self.db.update_batch_items(batch_id, pending)
+
+        elapsed = time.perf_counter() - started
+        summary["elapsed_s"] = elapsed
+        summary["courses_per_minute"] = summary["succeeded"] / elapsed * 60 if elapsed else 0.0
+        logger.info(f"Batch {batch_id}: {summary['succeeded']} succeeded, {summary['failed']} failed in {elapsed:.1f}s")
+        return summary
+
+    def get_report(self, batch_id, status=None):
+        counts = self.db.get_batch_counts(batch_id)
+        if not counts:
+            return None
+        return {
+            "batch_id": batch_id,
+            "counts": {name: value["count"] for name, value in counts.items()},
+            "duplicates": sum(value["duplicates"] for value in counts.values()),
+            "items": self.db.get_batch_items(batch_id, status),
+        }
@@ -0,0 +1,113 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from core.models import CourseOutline
+
+logger = logging.getLogger(__name__)
+
+
+def normalise_text(text: str) -> str:
+    return re.sub(r"\s+", " ", (text or "").strip().lower())
+
+
+def make_cache_key(kind: str, *parts: str) -> str:
+    raw = "\x1f".join([kind, *(normalise_text(part) for part in parts)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, db, memory_size=None, max_entries=None, ttl_seconds=None):
+        self.db = db
+        self.memory_size = memory_size if memory_size is not None else int(os.getenv("CACHE_MEMORY_SIZE", "256"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv("CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        self.enabled = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "db_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def _get(self, cache_key: str):
+        if not self.enabled:
+            return None
+
+        now = int(time.time())
+        with self._lock:
+            entry = self._memory.get(cache_key)
+            if entry and entry[0] >= now - self.ttl_seconds:
+                self._memory.move_to_end(cache_key)
+                self.stats["memory_hits"] += 1
+                return entry[1]
+            if entry:
+                del self._memory[cache_key]
+
+        row = self.db.get_cached_response(cache_key, now - self.ttl_seconds)
+        with self._lock:
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            value, created_at = row
+            self.stats["db_hits"] += 1
+            # Keeping the row's own age means the memory copy expires when the stored one does.
+            self._remember(cache_key, value, created_at)
+        return value
+
+    def _set(self, cache_key: str, kind: str, value: str):
+        if not self.enabled:
+            return
+
+        self.db.set_cached_response(cache_key, kind, value)
+        # Callers may be inside a transaction that still rolls back, so memory is only filled by reads.
+        with self._lock:
+            self._memory.pop(cache_key, None)
+            self.stats["writes"] += 1
+            should_evict = self.stats["writes"] % 100 == 0
+        if should_evict:
+            self.evict()
+
+    def _remember(self, cache_key: str, value: str, created_at: int):
+        self._memory[cache_key] = (created_at, value)
+        self._memory.move_to_end(cache_key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def evict(self) -> int:
+        removed = self.db.evict_cached_responses(int(time.time()) - self.ttl_seconds, self.max_entries)
+        with self._lock:
+            self.stats["evictions"] += removed
+        if removed:
+            logger.info(f"Evicted {removed} cached responses.")
+        return removed
+
+    def get_outline(self, description: str, level: str):
+        value = self._get(make_cache_key("outline", description, level))
+        return CourseOutline.model_validate_json(value) if value else None
+
+    def set_outline(self, description: str, level: str, outline: CourseOutline):
+        self._set(make_cache_key("outline", description, level), "outline", outline.model_dump_json())
+
+    def get_section(self, section_description: str):
+        return self._get(make_cache_key("section", section_description))
+
+    def set_section(self, section_description: str, content: str):
+        if content:
+            self._set(make_cache_key("section", section_description), "section", content)
+
+    def get_verdict(self, description: str):
+        value = self._get(make_cache_key("verdict", description))
+        return None if value is None else value == "true"
+
+    def set_verdict(self, description: str, is_valid: bool):
+        self._set(make_cache_key("verdict", description), "verdict", "true" if is_valid else "false")
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["db_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["db_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,46 @@
+import logging
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CODECS = ("zlib", "zstd", "none")
+
+
+def default_codec() -> str:
+    codec = os.getenv("SECTION_CONTENT_CODEC", "zlib")
+    if codec not in CODECS:
+        raise ValueError(f"Unknown SECTION_CONTENT_CODEC '{codec}'")
+    if codec == "zstd" and zstandard is None:
+        logger.warning("zstandard is not installed, falling back to zlib for section content.")
+        return "zlib"
+    return codec
+
+
+def compress_content(text, codec=None):
+    codec = codec or default_codec()
+    raw = (text or "").encode("utf-8")
+    if codec == "zlib":
+        return codec, zlib.compress(raw, 6)
+    if codec == "zstd":
+        return codec, zstandard.ZstdCompressor(level=6).compress(raw)
+    return "none", raw
+
+
+def decompress_content(codec, data):
+    if data is None:
+        return None
+    if codec == "zlib":
+        raw = zlib.decompress(data)
+    elif codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Section content is zstd-compressed but zstandard is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        raw = data
+    return raw.decode("utf-8")
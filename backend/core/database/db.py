@@ -1,33 +1,168 @@
 import os
+import queue
 import sqlite3
 import logging
 import json
+import threading
 import time
+from contextlib import contextmanager
 from datetime import timedelta
-from core.database.initialise import initialise_db
+from core.database.initialise import (
+    initialise_db, get_schema_version, rebuild_analytics_rollups, rebuild_course_counters,
+    rebuild_search_index, LATEST_VERSION
+)
+from core.database.content_store import compress_content, decompress_content, default_codec
+from core.database.search import highlight, make_snippet
 
 logger = logging.getLogger(__name__)
 
+TRANSFER_COLUMNS = {
+    "session": ("sessions", ("session_id", "description", "level", "progress")),
+    "course": ("courses", (
+        "course_id", "session_id", "title", "description", "level", "created_at",
+        "completion_percentage", "latest_completed_at", "completion_time"
+    )),
+    "section": ("sections", (
+        "section_id", "course_id", "title", "description", "section_order", "created_at", "is_completed", "completed_at"
+    )),
+}
+
+# (table, key, condition) for rows whose parent is gone, e.g. left by deletes made before foreign keys were enforced.
+ORPHAN_SWEEPS = [
+    ("sections", "section_id", "NOT EXISTS (SELECT 1 FROM courses c WHERE c.course_id = sections.course_id)"),
+    ("section_contents", "section_id",
+     "NOT EXISTS (SELECT 1 FROM sections s WHERE s.section_id = section_contents.section_id)"),
+    ("course_outlines", "course_id",
+     "NOT EXISTS (SELECT 1 FROM courses c WHERE c.course_id = course_outlines.course_id)"),
+    ("session_events", "session_id",
+     "NOT EXISTS (SELECT 1 FROM sessions s WHERE s.session_id = session_events.session_id)"),
+    ("session_metrics", "session_id",
+     "NOT EXISTS (SELECT 1 FROM sessions s WHERE s.session_id = session_metrics.session_id)"),
+]
+
+
 class Database:
     def __init__(self):
         self.db_path = os.getenv("DB_PATH","quip.db")
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.row_factory = sqlite3.Row
-        self.cursor = self.conn.cursor()
+        self.read_pool_size = int(os.getenv("DB_READ_POOL_SIZE", "8"))
+        self.busy_timeout_ms = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+        self.synchronous = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+        self.journal_mode = os.getenv("DB_JOURNAL_MODE", "WAL")
+
+        self._write_conn = self._connect()
+        # Only applies to a new file, and only before switching journal mode writes its first page.
+        self._write_conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._write_conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        self._write_lock = threading.RLock()
+        self._write_owner = None
+        self._write_depth = 0
+
+        self._read_pool = queue.LifoQueue()
+        self._read_conn_count = 0
+        self._read_pool_lock = threading.Lock()
+        self._columns = {}
+        self.content_codec = default_codec()
+        self.metrics = None
         self.health_check()
 
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=self.busy_timeout_ms / 1000)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def _acquire_read_conn(self):
+        try:
+            return self._read_pool.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._read_pool_lock:
+            can_open = self._read_conn_count < self.read_pool_size
+            if can_open:
+                self._read_conn_count += 1
+        if can_open:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            return conn
+        return self._read_pool.get()
+
+    def _observe(self, name, started):
+        if self.metrics:
+            self.metrics.observe(name, time.perf_counter() - started)
+
+    @contextmanager
+    def transaction(self):
+        wait_started = time.perf_counter()
+        with self._write_lock:
+            if self._write_depth == 0:
+                self._observe("quip_db_write_lock_wait_seconds", wait_started)
+            self._write_owner = threading.get_ident()
+            self._write_depth += 1
+            try:
+                yield self._write_conn.cursor()
+                if self._write_depth == 1:
+                    commit_started = time.perf_counter()
+                    self._write_conn.commit()
+                    self._observe("quip_db_commit_seconds", commit_started)
+            except Exception:
+                if self._write_depth == 1:
+                    self._write_conn.rollback()
+                raise
+            finally:
+                self._write_depth -= 1
+                if self._write_depth == 0:
+                    self._write_owner = None
+
+    @contextmanager
+    def _read(self):
+        if self._write_owner == threading.get_ident():
+            yield self._write_conn.cursor()
+            return
+
+        conn = self._acquire_read_conn()
+        cursor = conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+            self._read_pool.put(conn)
+
+    def _get_columns(self, table):
+        if table not in self._columns:
+            with self._read() as cursor:
+                cursor.execute(f"PRAGMA table_info({table})")
+                self._columns[table] = [row["name"] for row in cursor.fetchall()]
+        return self._columns[table]
+
+    def _projection(self, table, fields=None):
+        if not fields:
+            return "*"
+        columns = self._get_columns(table)
+        unknown = [field for field in fields if field not in columns]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return ", ".join(dict.fromkeys(fields))
+
+    def _fetch_page(self, query, params, limit, row_factory=dict):
+        with self._read() as cursor:
+            cursor.execute(query, (*params, limit + 1))
+            rows = [row_factory(row) for row in cursor.fetchall()]
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = rows[-1]["_cursor"] if has_more else None
+        for row in rows:
+            del row["_cursor"]
+        return {"items": rows, "next_cursor": next_cursor}
+
     def health_check(self) -> bool:
         try:
-            query = """
-                SELECT COUNT(name)
-                FROM sqlite_master
-                WHERE type='table'
-                AND name IN ('courses', 'sections', 'sessions');
-            """
-            self.cursor.execute(query)
-            table_count = self.cursor.fetchone()[0]
-            if table_count < 3:
-                logger.info("Tables missing. Initializing DB...")
+            with self._read() as cursor:
+                version = get_schema_version(cursor)
+            if version < LATEST_VERSION:
+                logger.info(f"Schema at version {version}, migrating to {LATEST_VERSION}...")
                 initialise_db(self.db_path)
             return True
         except Exception as e:
@@ -37,31 +172,37 @@ class Database:
     def create_session(self, session_id, actions, description, level, progress):
         query = """
         INSERT INTO sessions (session_id, actions, description, level, progress)
-        VALUES (?, ?, ?, ?, ?)
+        VALUES (?, NULL, ?, ?, ?)
         """
-        self.cursor.execute(query, (session_id, json.dumps(actions), description, level, progress))
-        self.conn.commit()
+        with self.transaction() as cursor:
+            cursor.execute(query, (session_id, description, level, progress))
+            self.append_session_actions(session_id, actions)
+
+    def _get_session_actions(self, cursor, session_id):
+        cursor.execute("SELECT action FROM session_events WHERE session_id = ? ORDER BY seq", (session_id,))
+        return [row["action"] for row in cursor.fetchall()]
 
     def get_session(self, session_id):
         query = "SELECT * FROM sessions WHERE session_id = ?"
-        self.cursor.execute(query, (session_id,))
-        row = self.cursor.fetchone()
-        if row:
+        with self._read() as cursor:
+            cursor.execute(query, (session_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
             result = dict(row)
-            result["actions"] = json.loads(result["actions"])
-            return result
-        return None
+            result["actions"] = self._get_session_actions(cursor, session_id)
+        return result
 
     def get_all_sessions(self):
         query = "SELECT * FROM sessions"
-        self.cursor.execute(query)
-        rows = self.cursor.fetchall()
-        sessions = []
-        for row in rows:
-            session = dict(row)
-            session["actions"] = json.loads(session["actions"])
-            sessions.append(session)
-        return sessions
+        with self._read() as cursor:
+            cursor.execute(query)
+            sessions = {row["session_id"]: {**dict(row), "actions": []} for row in cursor.fetchall()}
+            cursor.execute("SELECT session_id, action FROM session_events ORDER BY session_id, seq")
+            for row in cursor.fetchall():
+                if row["session_id"] in sessions:
+                    sessions[row["session_id"]]["actions"].append(row["action"])
+        return list(sessions.values())
 
     def update_session_progress(self, session_id, new_progress):
         if new_progress not in ("in_progress", "success", "error"):
@@ -72,64 +213,184 @@ class Database:
         SET progress = ?
         WHERE session_id = ?
         """
-        self.cursor.execute(query, (new_progress, session_id))
-        self.conn.commit()
-        return self.cursor.rowcount > 0
+        with self.transaction() as cursor:
+            cursor.execute(query, (new_progress, session_id))
+            return cursor.rowcount > 0
+
+    def append_session_actions(self, session_id, actions):
+        if not actions:
+            return
+        with self.transaction() as cursor:
+            cursor.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM session_events WHERE session_id = ?", (session_id,))
+            next_seq = cursor.fetchone()[0]
+            now = int(time.time())
+            cursor.executemany(
+                "INSERT INTO session_events (session_id, seq, action, created_at) VALUES (?, ?, ?, ?)",
+                [(session_id, next_seq + i, action, now) for i, action in enumerate(actions)]
+            )
+
+    def add_session_action(self, session_id, action):
+        self.append_session_actions(session_id, [action])
 
     def update_session_actions(self, session_id, actions):
-        query = "UPDATE sessions SET actions = ? WHERE session_id = ?"
-        self.cursor.execute(query, (json.dumps(actions), session_id))
-        self.conn.commit()
+        with self.transaction() as cursor:
+            existing = self._get_session_actions(cursor, session_id)
+            if actions[:len(existing)] != existing:
+                cursor.execute("DELETE FROM session_events WHERE session_id = ?", (session_id,))
+                existing = []
+            self.append_session_actions(session_id, actions[len(existing):])
 
     def update_and_get_session(self, session_id):
-        self.cursor.execute("SELECT * FROM sessions WHERE session_id = ?", (session_id,))
-        row = self.cursor.fetchone()
-        return dict(row) if row else None
+        return self.get_session(session_id)
 
 
-    def create_course(self, course_id, session_id, title, description, level, created_at):
+    def create_course(self, course_id, session_id, title, description, level, created_at, outline=None):
         query = """
         INSERT INTO courses (course_id, session_id, title, description, level, created_at, completion_percentage)
         VALUES (?, ?, ?, ?, ?, ?, ?)
         """
-        self.cursor.execute(query, (course_id, session_id, title, description, level, created_at, 0.0))
-        self.conn.commit()
+        with self.transaction() as cursor:
+            cursor.execute(query, (course_id, session_id, title, description, level, created_at, 0.0))
+            if outline is not None:
+                self.set_course_outline(course_id, outline)
+            self._index_document(cursor, 'course', course_id, course_id, title, description)
+            self._adjust_analytics_totals(cursor, total_courses=1)
+            self._bump_data_versions(cursor, course_id)
+
+    def set_course_outline(self, course_id, outline: str):
+        query = "INSERT OR REPLACE INTO course_outlines (course_id, outline) VALUES (?, ?)"
+        with self.transaction() as cursor:
+            cursor.execute(query, (course_id, outline))
+
+    def get_course_outline(self, course_id):
+        with self._read() as cursor:
+            cursor.execute("SELECT outline FROM course_outlines WHERE course_id = ?", (course_id,))
+            row = cursor.fetchone()
+        return row["outline"] if row else None
+
+    def get_course_for_session(self, session_id):
+        query = "SELECT * FROM courses WHERE session_id = ?"
+        with self._read() as cursor:
+            cursor.execute(query, (session_id,))
+            row = cursor.fetchone()
+        return dict(row) if row else None
 
 
     def delete_course(self, course_id):
         query = "DELETE FROM courses WHERE course_id = ?"
-        self.cursor.execute(query, (course_id,))
-        self.conn.commit()
-        return self.cursor.rowcount > 0 
-    
+        with self.transaction() as cursor:
+            self._unindex_course(cursor, course_id)
+            cursor.execute(
+                "SELECT session_id, completion_percentage, completion_time, total_sections, completed_sections "
+                "FROM courses WHERE course_id = ?",
+                (course_id,)
+            )
+            course = cursor.fetchone()
+            if not course:
+                return False
+
+            cursor.execute("""
+                SELECT strftime('%Y-%m-%d', completed_at, 'unixepoch') AS completion_date, COUNT(*) AS count
+                FROM sections
+                WHERE course_id = ? AND is_completed = 1 AND completed_at IS NOT NULL
+                GROUP BY completion_date
+            """, (course_id,))
+            for row in cursor.fetchall():
+                self._adjust_daily_completions(cursor, row["completion_date"], -row["count"])
+
+            completion_time = course["completion_time"]
+            self._adjust_analytics_totals(
+                cursor,
+                total_courses=-1,
+                completed_courses=-int(course["completion_percentage"] == 1.0),
+                total_sections=-course["total_sections"],
+                completed_sections=-course["completed_sections"],
+                completion_time_sum=-(completion_time or 0),
+                completion_time_count=-int(completion_time is not None)
+            )
+
+            # Sections, their content and the outline go with the course through ON DELETE CASCADE.
+            cursor.execute(query, (course_id,))
+            deleted = cursor.rowcount > 0
+            if course["session_id"]:
+                self._delete_session_rows(cursor, course["session_id"])
+            self._bump_data_versions(cursor, course_id)
+            return deleted
+
+    def _delete_session_rows(self, cursor, session_id):
+        cursor.execute("DELETE FROM session_events WHERE session_id = ?", (session_id,))
+        cursor.execute("DELETE FROM session_metrics WHERE session_id = ?", (session_id,))
+        cursor.execute("DELETE FROM jobs WHERE session_id = ? AND status IN ('succeeded', 'failed')", (session_id,))
+        cursor.execute("""
+            DELETE FROM sessions
+            WHERE session_id = ? AND NOT EXISTS (SELECT 1 FROM courses WHERE session_id = ?)
+        """, (session_id, session_id))
+        return cursor.rowcount > 0
+
+    def delete_session(self, session_id):
+        with self.transaction() as cursor:
+            cursor.execute("SELECT course_id FROM courses WHERE session_id = ?", (session_id,))
+            course_ids = [row["course_id"] for row in cursor.fetchall()]
+            for course_id in course_ids:
+                self.delete_course(course_id)
+            return self._delete_session_rows(cursor, session_id) or bool(course_ids)
+
+    def get_abandoned_sessions(self, inactive_since: int, limit: int = 100):
+        query = """
+        SELECT s.session_id FROM sessions s
+        WHERE s.progress = 'in_progress'
+        AND NOT EXISTS (
+            SELECT 1 FROM jobs j WHERE j.session_id = s.session_id
+            AND (j.status IN ('queued', 'running') OR COALESCE(j.finished_at, j.created_at) >= ?)
+        )
+        AND COALESCE((SELECT MAX(e.created_at) FROM session_events e WHERE e.session_id = s.session_id), 0) < ?
+        LIMIT ?
+        """
+        with self._read() as cursor:
+            cursor.execute(query, (inactive_since, inactive_since, limit))
+            return [row["session_id"] for row in cursor.fetchall()]
+
     def get_course(self, course_id):
         query = "SELECT * FROM courses WHERE course_id = ?"
-        self.cursor.execute(query, (course_id,))
-        row = self.cursor.fetchone()
+        with self._read() as cursor:
+            cursor.execute(query, (course_id,))
+            row = cursor.fetchone()
         return dict(row) if row else None
 
-    def get_all_courses(self):
-        query = "SELECT * FROM courses"
-        self.cursor.execute(query)
-        return [dict(row) for row in self.cursor.fetchall()]
+    def get_course_id_for_session(self, session_id):
+        query = "SELECT course_id FROM courses WHERE session_id = ?"
+        with self._read() as cursor:
+            cursor.execute(query, (session_id,))
+            row = cursor.fetchone()
+        return row["course_id"] if row else None
+
+    def get_all_courses(self, fields=None):
+        query = f"SELECT {self._projection('courses', fields)} FROM courses"
+        with self._read() as cursor:
+            cursor.execute(query)
+            return [dict(row) for row in cursor.fetchall()]
+
+    def get_courses_page(self, limit: int, after=None, fields=None):
+        query = f"""
+        SELECT rowid AS _cursor, {self._projection('courses', fields)} FROM courses
+        WHERE rowid > ?
+        ORDER BY rowid
+        LIMIT ?
+        """
+        return self._fetch_page(query, (after if after is not None else -1,), limit)
 
     def update_course_completion_percentage(self, course_id: str, percentage: float) -> bool:
         if not (0.0 <= percentage <= 1.0):
             raise ValueError("Completion percentage must be between 0.0 and 1.0")
 
-        query = """
-        UPDATE courses
-        SET completion_percentage = ?
-        WHERE course_id = ?
-        """
-        self.cursor.execute(query, (percentage, course_id))
-        self.conn.commit()
-        return self.cursor.rowcount > 0
+        with self.transaction() as cursor:
+            return self._set_course_completion(cursor, course_id, percentage)
 
     def get_incomplete_courses(self):
         query = "SELECT * FROM courses WHERE completion_percentage < 1.0"
-        self.cursor.execute(query)
-        return [dict(row) for row in self.cursor.fetchall()]
+        with self._read() as cursor:
+            cursor.execute(query)
+            return [dict(row) for row in cursor.fetchall()]
 
 
     def create_section(self, section_id, course_id, title, description, content, section_order, created_at):
@@ -137,149 +398,760 @@ class Database:
         INSERT INTO sections (section_id, course_id, title, description, content, section_order, created_at, is_completed, completed_at)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
         """
-        self.cursor.execute(query, (section_id, course_id, title, description, content, section_order, created_at, 0, None))
-        self.conn.commit()
-
-    def get_all_sections_for_course(self, course_id):
-        query = "SELECT * FROM sections WHERE course_id = ? ORDER BY section_order"
-        self.cursor.execute(query, (course_id,))
-        return [dict(row) for row in self.cursor.fetchall()]
-
-    def get_section(self, section_id: str):
-        query = "SELECT * FROM sections WHERE section_id = ?"
-        self.cursor.execute(query, (section_id,))
-        row = self.cursor.fetchone()
-        return dict(row) if row else None
+        with self.transaction() as cursor:
+            cursor.execute(query, (section_id, course_id, title, description, None, section_order, created_at, 0, None))
+            cursor.execute(
+                "INSERT INTO section_contents (section_id, codec, data) VALUES (?, ?, ?)",
+                (section_id, *compress_content(content, self.content_codec))
+            )
+            self._index_document(cursor, 'section', course_id, section_id, title, content)
+            cursor.execute("UPDATE courses SET total_sections = total_sections + 1 WHERE course_id = ?", (course_id,))
+            self._adjust_analytics_totals(cursor, total_sections=1)
+            self._bump_data_versions(cursor, course_id)
 
-    def complete_section(self, section_id: str):
-        completed_at = int(time.time())
-        query = """
-        UPDATE sections
-        SET is_completed = 1, completed_at = ?
-        WHERE section_id = ?
+    def _section_select(self, fields=None):
+        fields = list(dict.fromkeys(fields or self._get_columns('sections')))
+        self._projection('sections', fields)
+        columns = [f"s.{field}" for field in fields if field != 'content']
+        if 'content' not in fields:
+            return ", ".join(columns), "sections s"
+        columns += ["sc.codec AS _codec", "sc.data AS _data"]
+        return ", ".join(columns), "sections s LEFT JOIN section_contents sc ON sc.section_id = s.section_id"
+
+    @staticmethod
+    def _section_from_row(row):
+        section = dict(row)
+        if "_codec" in section:
+            section["content"] = decompress_content(section.pop("_codec"), section.pop("_data"))
+        return section
+
+    def get_all_sections_for_course(self, course_id, fields=None):
+        columns, source = self._section_select(fields)
+        query = f"SELECT {columns} FROM {source} WHERE s.course_id = ? ORDER BY s.section_order"
+        with self._read() as cursor:
+            cursor.execute(query, (course_id,))
+            return [self._section_from_row(row) for row in cursor.fetchall()]
+
+    def get_sections_page(self, course_id, limit: int, after=None, fields=None):
+        columns, source = self._section_select(fields)
+        query = f"""
+        SELECT s.section_order AS _cursor, {columns} FROM {source}
+        WHERE s.course_id = ? AND s.section_order > ?
+        ORDER BY s.section_order
+        LIMIT ?
         """
-        self.cursor.execute(query, (completed_at, section_id))
-        self.conn.commit()
-
-        course_id_query = "SELECT course_id FROM sections WHERE section_id = ?"
-        self.cursor.execute(course_id_query, (section_id,))
-        row = self.cursor.fetchone()
-        if row:
-            course_id = row["course_id"]
-            self.update_course_completion(course_id)
-        else:
+        return self._fetch_page(
+            query, (course_id, after if after is not None else -1), limit, row_factory=self._section_from_row
+        )
+
+    def get_section_content(self, section_id: str):
+        with self._read() as cursor:
+            cursor.execute("SELECT codec, data FROM section_contents WHERE section_id = ?", (section_id,))
+            row = cursor.fetchone()
+        return decompress_content(row["codec"], row["data"]) if row else None
+
+    def get_section_orders(self, course_id):
+        with self._read() as cursor:
+            cursor.execute("SELECT section_order FROM sections WHERE course_id = ?", (course_id,))
+            return {row["section_order"] for row in cursor.fetchall()}
+
+    def get_section(self, section_id: str, fields=None):
+        columns, source = self._section_select(fields)
+        query = f"SELECT {columns} FROM {source} WHERE s.section_id = ?"
+        with self._read() as cursor:
+            cursor.execute(query, (section_id,))
+            row = cursor.fetchone()
+        return self._section_from_row(row) if row else None
+
+    def complete_section(self, section_id: str):
+        result = self.complete_sections([section_id])
+        if result["not_found"]:
             logger.warning(f"Section {section_id} not found, unable to update course completion.")
 
+    def complete_sections(self, section_ids, batch_size=500):
+        completed_at = int(time.time())
+        section_ids = list(dict.fromkeys(section_ids))
+        with self.transaction() as cursor:
+            rows = []
+            for start in range(0, len(section_ids), batch_size):
+                batch = section_ids[start:start + batch_size]
+                placeholders = ", ".join("?" for _ in batch)
+                cursor.execute(
+                    f"SELECT section_id, course_id, is_completed, completed_at FROM sections WHERE section_id IN ({placeholders})",
+                    batch
+                )
+                rows.extend(cursor.fetchall())
+            if not rows:
+                return {"completed": 0, "not_found": section_ids}
+
+            cursor.executemany(
+                "UPDATE sections SET is_completed = 1, completed_at = ? WHERE section_id = ?",
+                [(completed_at, row["section_id"]) for row in rows]
+            )
+
+            daily_deltas = {self._completion_date(completed_at): len(rows)}
+            newly_completed = {}
+            for row in rows:
+                if row["is_completed"]:
+                    if row["completed_at"] is not None:
+                        date = self._completion_date(row["completed_at"])
+                        daily_deltas[date] = daily_deltas.get(date, 0) - 1
+                    newly_completed.setdefault(row["course_id"], 0)
+                else:
+                    newly_completed[row["course_id"]] = newly_completed.get(row["course_id"], 0) + 1
+            for date, delta in daily_deltas.items():
+                if delta:
+                    self._adjust_daily_completions(cursor, date, delta)
+            self._adjust_analytics_totals(cursor, completed_sections=sum(newly_completed.values()))
+
+            cursor.executemany(
+                """
+                UPDATE courses
+                SET completed_sections = completed_sections + ?, latest_completed_at = ?
+                WHERE course_id = ?
+                """,
+                [(count, completed_at, course_id) for course_id, count in newly_completed.items()]
+            )
+            for course_id in newly_completed:
+                self._refresh_course_completion(cursor, course_id)
+
+        found = {row["section_id"] for row in rows}
+        return {"completed": len(rows), "not_found": [section_id for section_id in section_ids if section_id not in found]}
 
     def update_course_completion(self, course_id: str):
-        total_query = "SELECT COUNT(*) as total FROM sections WHERE course_id = ?"
-        completed_query = "SELECT COUNT(*) as completed FROM sections WHERE course_id = ? AND is_completed = 1"
+        with self.transaction() as cursor:
+            self._refresh_course_completion(cursor, course_id)
 
-        self.cursor.execute(total_query, (course_id,))
-        total = self.cursor.fetchone()["total"]
+    def _refresh_course_completion(self, cursor, course_id: str):
+        cursor.execute("SELECT total_sections, completed_sections FROM courses WHERE course_id = ?", (course_id,))
+        row = cursor.fetchone()
+        if not row:
+            return False
+        percentage = row["completed_sections"] / row["total_sections"] if row["total_sections"] else 0.0
+        return self._set_course_completion(cursor, course_id, percentage)
 
-        if total == 0:
-            percentage = 0.0
-        else:
-            self.cursor.execute(completed_query, (course_id,))
-            completed = self.cursor.fetchone()["completed"]
-            percentage = completed / total
+    def _set_course_completion(self, cursor, course_id: str, percentage: float) -> bool:
+        cursor.execute(
+            "SELECT completion_percentage, created_at, latest_completed_at, completion_time FROM courses WHERE course_id = ?",
+            (course_id,)
+        )
+        course = cursor.fetchone()
+        if not course:
+            return False
+
+        completion_time = None
+        if percentage == 1.0 and course["latest_completed_at"] is not None:
+            completion_time = course["latest_completed_at"] - course["created_at"]
 
         update_query = """
         UPDATE courses
-        SET completion_percentage = ?
+        SET completion_percentage = ?, completion_time = ?
         WHERE course_id = ?
         """
-        self.cursor.execute(update_query, (percentage, course_id))
-        self.conn.commit()
+        cursor.execute(update_query, (percentage, completion_time, course_id))
+
+        previous_time = course["completion_time"]
+        self._adjust_analytics_totals(
+            cursor,
+            completed_courses=int(percentage == 1.0) - int(course["completion_percentage"] == 1.0),
+            completion_time_sum=(completion_time or 0) - (previous_time or 0),
+            completion_time_count=int(completion_time is not None) - int(previous_time is not None)
+        )
+        self._bump_data_versions(cursor, course_id)
+        return True
 
-    def get_incomplete_sections(self, course_id: str):
+    def _bump_data_versions(self, cursor, course_id=None, course_ids=()):
+        course_ids = ([course_id] if course_id else []) + list(course_ids)
+        scopes = ["global"] + [f"course:{course_id}" for course_id in course_ids]
         query = """
-        SELECT * FROM sections
-        WHERE course_id = ? AND is_completed = 0
-        ORDER BY section_order
+        INSERT INTO data_versions (scope, version) VALUES (?, 1)
+        ON CONFLICT(scope) DO UPDATE SET version = version + 1
         """
-        self.cursor.execute(query, (course_id,))
-        return [dict(row) for row in self.cursor.fetchall()]
+        cursor.executemany(query, [(scope,) for scope in scopes])
 
-    def get_analytics_data(self):
-        analytics_data = {}
-        courses_query = """
-            SELECT
-                c.course_id,
-                c.title,
-                c.completion_percentage,
-                MAX(s.completed_at) AS latest_completed_at
-            FROM courses c
-            LEFT JOIN sections s ON c.course_id = s.course_id AND s.is_completed = 1
-            GROUP BY c.course_id, c.title, c.completion_percentage
-            ORDER BY c.title;
+    def get_data_version(self, scope: str) -> int:
+        with self._read() as cursor:
+            cursor.execute("SELECT version FROM data_versions WHERE scope = ?", (scope,))
+            row = cursor.fetchone()
+        return row["version"] if row else 0
+
+    @staticmethod
+    def _completion_date(timestamp: int) -> str:
+        return time.strftime('%Y-%m-%d', time.gmtime(timestamp))
+
+    def _adjust_analytics_totals(self, cursor, **deltas):
+        deltas = {column: delta for column, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        assignments = ", ".join(f"{column} = {column} + ?" for column in deltas)
+        cursor.execute("INSERT OR IGNORE INTO analytics_totals (id) VALUES (1)")
+        cursor.execute(f"UPDATE analytics_totals SET {assignments} WHERE id = 1", tuple(deltas.values()))
+
+    def _adjust_daily_completions(self, cursor, completion_date: str, delta: int):
+        query = """
+        INSERT INTO analytics_daily_completions (completion_date, completed_sections_count)
+        VALUES (?, ?)
+        ON CONFLICT(completion_date) DO UPDATE
+        SET completed_sections_count = completed_sections_count + excluded.completed_sections_count
         """
-        self.cursor.execute(courses_query)
-        courses_data = []
-        for row in self.cursor.fetchall():
-            course = dict(row)
-            if course['latest_completed_at']:
-                course['latest_completed_at_readable'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(course['latest_completed_at']))
-            else:
-                course['latest_completed_at_readable'] = None
-            courses_data.append(course)
-        analytics_data['courses_table'] = courses_data
-
-        avg_completion_time_query = """
-            SELECT
-                AVG(latest_completed_at - created_at) AS avg_time_to_complete
-            FROM (
-                SELECT
-                    c.created_at,
-                    MAX(s.completed_at) AS latest_completed_at
-                FROM courses c
-                JOIN sections s ON c.course_id = s.course_id
-                WHERE c.completion_percentage = 1.0
-                GROUP BY c.course_id, c.created_at
-            ) AS completed_course_times;
+        cursor.execute(query, (completion_date, delta))
+
+    def rebuild_analytics(self):
+        with self.transaction() as cursor:
+            rebuild_course_counters(cursor)
+            rebuild_analytics_rollups(cursor)
+
+    def get_incomplete_sections(self, course_id: str, fields=None):
+        columns, source = self._section_select(fields)
+        query = f"""
+        SELECT {columns} FROM {source}
+        WHERE s.course_id = ? AND s.is_completed = 0
+        ORDER BY s.section_order
         """
-        self.cursor.execute(avg_completion_time_query)
-        avg_completion_time = self.cursor.fetchone()['avg_time_to_complete']
+        with self._read() as cursor:
+            cursor.execute(query, (course_id,))
+            return [self._section_from_row(row) for row in cursor.fetchall()]
+
+    def get_analytics_data(self):
+        analytics_data = {}
+        with self._read() as cursor:
+            courses_query = """
+                SELECT course_id, title, completion_percentage, latest_completed_at
+                FROM courses
+                ORDER BY title;
+            """
+            cursor.execute(courses_query)
+            courses_data = []
+            for row in cursor.fetchall():
+                course = dict(row)
+                if course['latest_completed_at']:
+                    course['latest_completed_at_readable'] = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(course['latest_completed_at']))
+                else:
+                    course['latest_completed_at_readable'] = None
+                courses_data.append(course)
+            analytics_data['courses_table'] = courses_data
+
+            cursor.execute("SELECT * FROM analytics_totals WHERE id = 1")
+            totals = cursor.fetchone()
+            totals = dict(totals) if totals else {}
+
+            daily_completions_query = """
+                SELECT completion_date, completed_sections_count
+                FROM analytics_daily_completions
+                WHERE completed_sections_count > 0
+                ORDER BY completion_date;
+            """
+            cursor.execute(daily_completions_query)
+            daily_completions = [dict(row) for row in cursor.fetchall()]
+
+        completion_time_count = totals.get('completion_time_count', 0)
+        avg_completion_time = totals['completion_time_sum'] / completion_time_count if completion_time_count else None
         analytics_data['average_course_completion_time_seconds'] = avg_completion_time
         if avg_completion_time:
             analytics_data['average_course_completion_time_readable'] = str(timedelta(seconds=int(avg_completion_time)))
         else:
             analytics_data['average_course_completion_time_readable'] = None
 
-        total_courses_query = "SELECT COUNT(*) FROM courses;"
-        completed_courses_query = "SELECT COUNT(*) FROM courses WHERE completion_percentage = 1.0;"
-        self.cursor.execute(total_courses_query)
-        total_courses = self.cursor.fetchone()[0]
-        self.cursor.execute(completed_courses_query)
-        completed_courses = self.cursor.fetchone()[0]
         analytics_data['course_counts'] = {
-            'total': total_courses,
-            'completed': completed_courses
+            'total': totals.get('total_courses', 0),
+            'completed': totals.get('completed_courses', 0)
         }
-
-        total_sections_query = "SELECT COUNT(*) FROM sections;"
-        completed_sections_query = "SELECT COUNT(*) FROM sections WHERE is_completed = 1;"
-        self.cursor.execute(total_sections_query)
-        total_sections = self.cursor.fetchone()[0]
-        self.cursor.execute(completed_sections_query)
-        completed_sections = self.cursor.fetchone()[0]
         analytics_data['section_counts'] = {
-            'total': total_sections,
-            'completed': completed_sections
+            'total': totals.get('total_sections', 0),
+            'completed': totals.get('completed_sections', 0)
         }
+        analytics_data['daily_section_completions'] = daily_completions
+
+        return analytics_data
+
+    def get_cached_response(self, cache_key: str, min_created_at: int):
+        query = "SELECT value, created_at FROM response_cache WHERE cache_key = ? AND created_at >= ?"
+        with self._read() as cursor:
+            cursor.execute(query, (cache_key, min_created_at))
+            row = cursor.fetchone()
+        if not row:
+            return None
 
-        daily_completions_query = """
-            SELECT
-                strftime('%Y-%m-%d', completed_at, 'unixepoch') AS completion_date,
-                COUNT(*) AS completed_sections_count
-            FROM sections
-            WHERE is_completed = 1 AND completed_at IS NOT NULL
-            GROUP BY completion_date
-            ORDER BY completion_date;
+        with self.transaction() as cursor:
+            cursor.execute(
+                "UPDATE response_cache SET last_accessed = ? WHERE cache_key = ?",
+                (int(time.time()), cache_key)
+            )
+        return row["value"], row["created_at"]
+
+    def set_cached_response(self, cache_key: str, kind: str, value: str):
+        now = int(time.time())
+        query = """
+        INSERT OR REPLACE INTO response_cache (cache_key, kind, value, created_at, last_accessed)
+        VALUES (?, ?, ?, ?, ?)
         """
-        self.cursor.execute(daily_completions_query)
-        daily_completions = [dict(row) for row in self.cursor.fetchall()]
-        analytics_data['daily_section_completions'] = daily_completions
+        with self.transaction() as cursor:
+            cursor.execute(query, (cache_key, kind, value, now, now))
+
+    def evict_cached_responses(self, min_created_at: int, max_entries: int) -> int:
+        query = """
+        DELETE FROM response_cache
+        WHERE cache_key IN (
+            SELECT cache_key FROM response_cache
+            ORDER BY last_accessed DESC
+            LIMIT -1 OFFSET ?
+        )
+        """
+        with self.transaction() as cursor:
+            cursor.execute("DELETE FROM response_cache WHERE created_at < ?", (min_created_at,))
+            expired = cursor.rowcount
+            cursor.execute(query, (max_entries,))
+            evicted = cursor.rowcount
+        return expired + evicted
 
-        return analytics_data
\ No newline at end of file
+    def sweep_orphans(self, batch_size: int = 500):
+        swept = {}
+        for table, key, condition in ORPHAN_SWEEPS:
+            query = f"DELETE FROM {table} WHERE {key} IN (SELECT {key} FROM {table} WHERE {condition} LIMIT ?)"
+            swept[table] = 0
+            while True:
+                # Small transactions let requests take the write lock between batches.
+                with self.transaction() as cursor:
+                    cursor.execute(query, (batch_size,))
+                    deleted = cursor.rowcount
+                if not deleted:
+                    break
+                swept[table] += deleted
+
+        with self.transaction() as cursor:
+            cursor.execute("""
+                UPDATE courses SET session_id = NULL
+                WHERE session_id IS NOT NULL
+                AND NOT EXISTS (SELECT 1 FROM sessions s WHERE s.session_id = courses.session_id)
+            """)
+            swept["course_sessions"] = cursor.rowcount
+            cursor.execute("""
+                DELETE FROM search_documents
+                WHERE NOT EXISTS (SELECT 1 FROM courses c WHERE c.course_id = search_documents.course_id)
+                OR (kind = 'section' AND NOT EXISTS (SELECT 1 FROM sections s WHERE s.section_id = search_documents.item_id))
+            """)
+            swept["search_documents"] = cursor.rowcount
+            if swept["search_documents"]:
+                # Without the original text, stale rows can only leave the contentless index by rebuilding it.
+                cursor.execute("INSERT INTO search_index (search_index) VALUES ('delete-all')")
+                rebuild_search_index(cursor)
+            if any(swept.values()):
+                self._bump_data_versions(cursor)
+        return swept
+
+    def get_storage_stats(self):
+        stats = {}
+        with self._read() as cursor:
+            for pragma in ("page_size", "page_count", "freelist_count", "auto_vacuum"):
+                cursor.execute(f"PRAGMA {pragma}")
+                stats[pragma] = cursor.fetchone()[0]
+        return stats
+
+    def incremental_vacuum(self, max_pages: int) -> int:
+        with self.transaction() as cursor:
+            cursor.execute("PRAGMA freelist_count")
+            before = cursor.fetchone()[0]
+            cursor.execute(f"PRAGMA incremental_vacuum({int(max_pages)})")
+            cursor.fetchall()
+            cursor.execute("PRAGMA freelist_count")
+            return before - cursor.fetchone()[0]
+
+    def create_job(self, job_id, kind, session_id, payload):
+        query = """
+        INSERT INTO jobs (job_id, kind, session_id, payload, status, created_at)
+        VALUES (?, ?, ?, ?, 'queued', ?)
+        """
+        with self.transaction() as cursor:
+            cursor.execute(query, (job_id, kind, session_id, json.dumps(payload), int(time.time())))
+
+    def _job_from_row(self, row):
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"]) if job["payload"] else {}
+        return job
+
+    def get_job(self, job_id):
+        with self._read() as cursor:
+            cursor.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,))
+            row = cursor.fetchone()
+        return self._job_from_row(row) if row else None
+
+    def claim_next_job(self, worker_id):
+        with self.transaction() as cursor:
+            cursor.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY rowid LIMIT 1")
+            row = cursor.fetchone()
+            if not row:
+                return None
+            query = """
+            UPDATE jobs
+            SET status = 'running', worker_id = ?, started_at = ?, attempts = attempts + 1
+            WHERE job_id = ? AND status = 'queued'
+            """
+            cursor.execute(query, (worker_id, int(time.time()), row["job_id"]))
+            if cursor.rowcount == 0:
+                return None
+        job = self._job_from_row(row)
+        job.update(status="running", worker_id=worker_id)
+        return job
+
+    def finish_job(self, job_id, status, error=None):
+        if status not in ("succeeded", "failed"):
+            raise ValueError("Invalid job status")
+        query = "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?"
+        with self.transaction() as cursor:
+            cursor.execute(query, (status, error, int(time.time()), job_id))
+
+    def count_jobs(self, statuses):
+        placeholders = ", ".join("?" for _ in statuses)
+        with self._read() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM jobs WHERE status IN ({placeholders})", tuple(statuses))
+            return cursor.fetchone()[0]
+
+    def get_job_counts(self):
+        with self._read() as cursor:
+            cursor.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status")
+            return {row["status"]: row["count"] for row in cursor.fetchall()}
+
+    def get_job_queue_position(self, job_id):
+        query = """
+        SELECT COUNT(*) FROM jobs
+        WHERE status = 'queued' AND rowid < (SELECT rowid FROM jobs WHERE job_id = ?)
+        """
+        with self._read() as cursor:
+            cursor.execute(query, (job_id,))
+            return cursor.fetchone()[0]
+
+    def get_active_job_for_session(self, session_id):
+        query = """
+        SELECT * FROM jobs
+        WHERE session_id = ? AND status IN ('queued', 'running')
+        ORDER BY rowid DESC
+        LIMIT 1
+        """
+        with self._read() as cursor:
+            cursor.execute(query, (session_id,))
+            row = cursor.fetchone()
+        return self._job_from_row(row) if row else None
+
+    def get_running_jobs(self):
+        with self._read() as cursor:
+            cursor.execute("SELECT * FROM jobs WHERE status = 'running'")
+            return [self._job_from_row(row) for row in cursor.fetchall()]
+
+    def requeue_jobs(self, job_ids):
+        query = "UPDATE jobs SET status = 'queued', worker_id = NULL WHERE job_id = ? AND status = 'running'"
+        with self.transaction() as cursor:
+            cursor.executemany(query, [(job_id,) for job_id in job_ids])
+
+    def save_session_metrics(self, session_id, records):
+        query = """
+        INSERT INTO session_metrics (session_id, stage, detail, started_at, duration_ms, input_tokens, output_tokens)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """
+        with self.transaction() as cursor:
+            cursor.executemany(query, [
+                (session_id, r["stage"], r["detail"], r["started_at"], r["duration_ms"], r["input_tokens"], r["output_tokens"])
+                for r in records
+            ])
+
+    def get_session_metrics(self, session_id):
+        query = """
+        SELECT stage, detail, started_at, duration_ms, input_tokens, output_tokens
+        FROM session_metrics
+        WHERE session_id = ?
+        ORDER BY started_at
+        """
+        with self._read() as cursor:
+            cursor.execute(query, (session_id,))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def add_batch_items(self, batch_id, items):
+        query = """
+        INSERT INTO batch_items (batch_id, item_key, line, duplicates, session_id, description, level, status, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', ?)
+        ON CONFLICT(batch_id, item_key) DO NOTHING
+        """
+        now = int(time.time())
+        with self.transaction() as cursor:
+            cursor.executemany(query, [
+                (batch_id, item["item_key"], item["line"], item["duplicates"], item["session_id"],
+                 item["description"], item["level"], now)
+                for item in items
+            ])
+            return cursor.rowcount
+
+    def get_batch_items(self, batch_id, status=None):
+        query = """
+        SELECT * FROM batch_items
+        WHERE batch_id = ? AND (? IS NULL OR status = ?)
+        ORDER BY line
+        """
+        with self._read() as cursor:
+            cursor.execute(query, (batch_id, status, status))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def update_batch_items(self, batch_id, results):
+        query = """
+        UPDATE batch_items
+        SET status = ?, course_id = ?, error = ?, duration_ms = ?, updated_at = ?
+        WHERE batch_id = ? AND item_key = ?
+        """
+        now = int(time.time())
+        with self.transaction() as cursor:
+            cursor.executemany(query, [
+                (r["status"], r.get("course_id"), r.get("error"), r.get("duration_ms"), now, batch_id, r["item_key"])
+                for r in results
+            ])
+
+    def get_batch_counts(self, batch_id):
+        query = """
+        SELECT status, COUNT(*) AS count, COALESCE(SUM(duplicates), 0) AS duplicates
+        FROM batch_items WHERE batch_id = ?
+        GROUP BY status
+        """
+        with self._read() as cursor:
+            cursor.execute(query, (batch_id,))
+            return {row["status"]: {"count": row["count"], "duplicates": row["duplicates"]} for row in cursor.fetchall()}
+
+    def iter_export(self, course_ids=None):
+        course_columns = ", ".join(f"c.{column}" for column in TRANSFER_COLUMNS["course"][1])
+        section_columns = ", ".join(f"s.{column}" for column in TRANSFER_COLUMNS["section"][1])
+        session_columns = ", ".join(f"se.{column} AS _{column}" for column in TRANSFER_COLUMNS["session"][1])
+        where = ""
+        if course_ids:
+            where = f"WHERE c.course_id IN ({', '.join('?' for _ in course_ids)})"
+        courses_query = f"""
+        SELECT {course_columns}, o.outline, {session_columns}
+        FROM courses c
+        LEFT JOIN course_outlines o ON o.course_id = c.course_id
+        LEFT JOIN sessions se ON se.session_id = c.session_id
+        {where}
+        ORDER BY c.rowid
+        """
+        sections_query = f"""
+        SELECT {section_columns}, sc.codec, sc.data
+        FROM sections s LEFT JOIN section_contents sc ON sc.section_id = s.section_id
+        WHERE s.course_id = ?
+        ORDER BY s.section_order
+        """
+
+        # One read transaction keeps the export a consistent snapshot while rows are streamed out. A slow download
+        # holds it for its whole length, so it gets its own connection instead of starving the read pool.
+        conn = self._connect()
+        conn.execute("PRAGMA query_only = ON")
+        courses = conn.cursor()
+        sections = conn.cursor()
+        try:
+            conn.execute("BEGIN")
+            courses.execute(courses_query, tuple(course_ids or ()))
+            for row in courses:
+                course = dict(row)
+                if course["_session_id"]:
+                    yield {
+                        "type": "session",
+                        **{column: course[f"_{column}"] for column in TRANSFER_COLUMNS["session"][1]},
+                    }
+                else:
+                    # The session row is gone, so exporting the reference would fail the foreign key on import.
+                    course["session_id"] = None
+                yield {"type": "course", **{key: value for key, value in course.items() if not key.startswith("_")}}
+
+                sections.execute(sections_query, (course["course_id"],))
+                for section_row in sections:
+                    section = dict(section_row)
+                    section["content"] = decompress_content(section.pop("codec"), section.pop("data"))
+                    yield {"type": "section", **section}
+        finally:
+            courses.close()
+            sections.close()
+            conn.rollback()
+            conn.close()
+
+    def import_records(self, records, batch_size=None):
+        batch_size = batch_size or int(os.getenv("IMPORT_BATCH_SIZE", "2000"))
+        stats = {"sessions": 0, "courses": 0, "sections": 0, "skipped": 0}
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= batch_size:
+                self._import_batch(batch, stats)
+                batch = []
+        if batch:
+            self._import_batch(batch, stats)
+        return stats
+
+    def _import_batch(self, records, stats):
+        rows = {kind: [] for kind in TRANSFER_COLUMNS}
+        outlines = []
+        contents = []
+        section_bodies = {}
+        for record in records:
+            kind = record.get("type")
+            if kind not in TRANSFER_COLUMNS:
+                raise ValueError(f"Unknown record type '{kind}'")
+            rows[kind].append(tuple(record.get(column) for column in TRANSFER_COLUMNS[kind][1]))
+            if kind == "course" and record.get("outline"):
+                outlines.append((record["course_id"], record["outline"]))
+            elif kind == "section":
+                contents.append((record["section_id"], *compress_content(record.get("content"), self.content_codec)))
+                section_bodies[record["section_id"]] = record.get("content")
+
+        # Every batch indexes and counts only the rows it inserted, in the same transaction, so a
+        # failure in a later batch leaves the batches already committed fully consistent.
+        try:
+            with self.transaction() as cursor:
+                inserted = {}
+                for kind, counter in (("session", "sessions"), ("course", "courses"), ("section", "sections")):
+                    if not rows[kind]:
+                        continue
+                    table, columns = TRANSFER_COLUMNS[kind]
+                    existing = self._existing_ids(cursor, table, columns[0], [row[0] for row in rows[kind]])
+                    new_rows = list({row[0]: row for row in rows[kind] if row[0] not in existing}.values())
+                    placeholders = ", ".join("?" for _ in columns)
+                    cursor.executemany(
+                        f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", new_rows
+                    )
+                    inserted[kind] = [dict(zip(columns, row)) for row in new_rows]
+                    stats[counter] += len(new_rows)
+                    stats["skipped"] += len(rows[kind]) - len(new_rows)
+                cursor.executemany("INSERT OR IGNORE INTO course_outlines (course_id, outline) VALUES (?, ?)", outlines)
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO section_contents (section_id, codec, data) VALUES (?, ?, ?)", contents
+                )
+                self._account_imported(cursor, inserted.get("course", []), inserted.get("section", []), section_bodies)
+        except sqlite3.IntegrityError as e:
+            # Foreign keys are enforced, so a section whose course is neither in the file nor the database fails.
+            raise ValueError(f"Import references a missing session, course or section: {e}")
+
+    def _account_imported(self, cursor, courses, sections, section_bodies):
+        for course in courses:
+            self._index_document(cursor, "course", course["course_id"], course["course_id"], course["title"], course["description"])
+        self._adjust_analytics_totals(
+            cursor,
+            total_courses=len(courses),
+            completed_courses=sum(course["completion_percentage"] == 1.0 for course in courses),
+            completion_time_sum=sum(course["completion_time"] or 0 for course in courses),
+            completion_time_count=sum(course["completion_time"] is not None for course in courses)
+        )
+
+        counters = {}
+        daily_deltas = {}
+        for section in sections:
+            self._index_document(
+                cursor, "section", section["course_id"], section["section_id"], section["title"],
+                section_bodies.get(section["section_id"])
+            )
+            total, completed, latest = counters.get(section["course_id"], (0, 0, None))
+            if section["is_completed"]:
+                completed += 1
+                if section["completed_at"] is not None:
+                    latest = max(latest or 0, section["completed_at"])
+                    date = self._completion_date(section["completed_at"])
+                    daily_deltas[date] = daily_deltas.get(date, 0) + 1
+            counters[section["course_id"]] = (total + 1, completed, latest)
+        for date, delta in daily_deltas.items():
+            self._adjust_daily_completions(cursor, date, delta)
+        self._adjust_analytics_totals(
+            cursor,
+            total_sections=len(sections),
+            completed_sections=sum(completed for _, completed, _ in counters.values())
+        )
+        cursor.executemany(
+            """
+            UPDATE courses
+            SET total_sections = total_sections + ?, completed_sections = completed_sections + ?,
+                latest_completed_at = COALESCE(MAX(latest_completed_at, ?), latest_completed_at, ?)
+            WHERE course_id = ?
+            """,
+            [(total, completed, latest, latest, course_id) for course_id, (total, completed, latest) in counters.items()]
+        )
+        # _refresh_course_completion bumps the versions of the courses it touches.
+        for course_id in counters:
+            self._refresh_course_completion(cursor, course_id)
+        self._bump_data_versions(cursor, course_ids=[course["course_id"] for course in courses if course["course_id"] not in counters])
+
+    @staticmethod
+    def _existing_ids(cursor, table, column, ids, batch_size=500):
+        existing = set()
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            placeholders = ", ".join("?" for _ in batch)
+            cursor.execute(f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})", batch)
+            existing.update(row[0] for row in cursor.fetchall())
+        return existing
+
+    def _index_document(self, cursor, kind, course_id, item_id, title, body):
+        cursor.execute(
+            "INSERT INTO search_documents (kind, course_id, item_id) VALUES (?, ?, ?)",
+            (kind, course_id, item_id)
+        )
+        cursor.execute(
+            "INSERT INTO search_index (rowid, title, body) VALUES (?, ?, ?)",
+            (cursor.lastrowid, title or "", body or "")
+        )
+
+    def _unindex_course(self, cursor, course_id):
+        # search_index is contentless, so deleting a row means replaying the text it was indexed with.
+        cursor.execute("""
+            SELECT d.doc_id, COALESCE(s.title, c.title) AS title, c.description, sc.codec, sc.data
+            FROM search_documents d
+            LEFT JOIN courses c ON d.kind = 'course' AND c.course_id = d.item_id
+            LEFT JOIN sections s ON d.kind = 'section' AND s.section_id = d.item_id
+            LEFT JOIN section_contents sc ON sc.section_id = s.section_id
+            WHERE d.course_id = ?
+        """, (course_id,))
+        documents = [
+            (row["doc_id"], row["title"] or "", row["description"] or decompress_content(row["codec"], row["data"]) or "")
+            for row in cursor.fetchall()
+        ]
+        cursor.executemany(
+            "INSERT INTO search_index (search_index, rowid, title, body) VALUES ('delete', ?, ?, ?)", documents
+        )
+        cursor.execute("DELETE FROM search_documents WHERE course_id = ?", (course_id,))
+
+    def search(self, match_query: str, terms, limit: int, offset: int = 0, kind=None):
+        query = """
+        SELECT
+            d.kind,
+            d.course_id,
+            CASE WHEN d.kind = 'section' THEN d.item_id END AS section_id,
+            c.title AS course_title,
+            c.description AS course_description,
+            bm25(search_index, 10.0, 1.0) AS score
+        FROM search_index
+        JOIN search_documents d ON d.doc_id = search_index.rowid
+        JOIN courses c ON c.course_id = d.course_id
+        WHERE search_index MATCH ?
+        AND (? IS NULL OR d.kind = ?)
+        ORDER BY score
+        LIMIT ? OFFSET ?
+        """
+        with self._read() as cursor:
+            cursor.execute(query, (match_query, kind, kind, limit + 1, offset))
+            rows = [dict(row) for row in cursor.fetchall()]
+            next_offset = offset + limit if len(rows) > limit else None
+            rows = rows[:limit]
+
+            # The index is contentless, so only this page's section bodies are decompressed for snippets.
+            section_ids = [row["section_id"] for row in rows if row["section_id"]]
+            sections = {}
+            if section_ids:
+                placeholders = ", ".join("?" for _ in section_ids)
+                cursor.execute(f"""
+                    SELECT s.section_id, s.title, sc.codec, sc.data
+                    FROM sections s LEFT JOIN section_contents sc ON sc.section_id = s.section_id
+                    WHERE s.section_id IN ({placeholders})
+                """, section_ids)
+                sections = {
+                    row["section_id"]: (row["title"], decompress_content(row["codec"], row["data"]))
+                    for row in cursor.fetchall()
+                }
+
+        items = []
+        for row in rows:
+            course_description = row.pop("course_description")
+            if row["section_id"]:
+                title, body = sections.get(row["section_id"], (None, None))
+            else:
+                title, body = row["course_title"], course_description
+            items.append({**row, "title": highlight(title, terms), "snippet": make_snippet(body, terms)})
+        return {"items": items, "next_offset": next_offset}
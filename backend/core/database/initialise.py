@@ -1,5 +1,11 @@
 import sqlite3
 import os
+import json
+import logging
+
+from core.database.content_store import compress_content, decompress_content
+
+logger = logging.getLogger(__name__)
 
 CREATE_SESSIONS_TABLE = """
 CREATE TABLE IF NOT EXISTS sessions (
@@ -39,16 +45,430 @@ CREATE TABLE IF NOT EXISTS sections (
 )
 """
 
-def initialise_db(db_name="quip.db"):
-    conn = sqlite3.connect(db_name)
+CREATE_RESPONSE_CACHE_TABLE = """
+CREATE TABLE IF NOT EXISTS response_cache (
+    cache_key TEXT PRIMARY KEY,
+    kind TEXT,
+    value TEXT,
+    created_at INTEGER,
+    last_accessed INTEGER
+)
+"""
+
+CREATE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_sections_course_order ON sections(course_id, section_order)",
+    "CREATE INDEX IF NOT EXISTS idx_sections_course_completed ON sections(course_id, is_completed, completed_at)",
+    "CREATE INDEX IF NOT EXISTS idx_sections_completed ON sections(is_completed, completed_at)",
+    "CREATE INDEX IF NOT EXISTS idx_courses_completion ON courses(completion_percentage)",
+    "CREATE INDEX IF NOT EXISTS idx_courses_session ON courses(session_id)",
+    "CREATE INDEX IF NOT EXISTS idx_response_cache_last_accessed ON response_cache(last_accessed)",
+    "CREATE INDEX IF NOT EXISTS idx_response_cache_created ON response_cache(created_at)",
+]
+
+CREATE_ANALYTICS_TOTALS_TABLE = """
+CREATE TABLE IF NOT EXISTS analytics_totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total_courses INTEGER NOT NULL DEFAULT 0,
+    completed_courses INTEGER NOT NULL DEFAULT 0,
+    total_sections INTEGER NOT NULL DEFAULT 0,
+    completed_sections INTEGER NOT NULL DEFAULT 0,
+    completion_time_sum INTEGER NOT NULL DEFAULT 0,
+    completion_time_count INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+CREATE_ANALYTICS_DAILY_TABLE = """
+CREATE TABLE IF NOT EXISTS analytics_daily_completions (
+    completion_date TEXT PRIMARY KEY,
+    completed_sections_count INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def rebuild_analytics_rollups(cursor):
+    cursor.execute("""
+        UPDATE courses
+        SET latest_completed_at = (
+            SELECT MAX(s.completed_at) FROM sections s
+            WHERE s.course_id = courses.course_id AND s.is_completed = 1
+        )
+    """)
+    cursor.execute("""
+        UPDATE courses
+        SET completion_time = CASE
+            WHEN completion_percentage = 1.0 AND latest_completed_at IS NOT NULL
+            THEN latest_completed_at - created_at
+        END
+    """)
+
+    cursor.execute("DELETE FROM analytics_totals")
+    cursor.execute("""
+        INSERT INTO analytics_totals (
+            id, total_courses, completed_courses, total_sections, completed_sections,
+            completion_time_sum, completion_time_count
+        )
+        SELECT
+            1,
+            (SELECT COUNT(*) FROM courses),
+            (SELECT COUNT(*) FROM courses WHERE completion_percentage = 1.0),
+            (SELECT COUNT(*) FROM sections WHERE course_id IN (SELECT course_id FROM courses)),
+            (SELECT COUNT(*) FROM sections WHERE is_completed = 1 AND course_id IN (SELECT course_id FROM courses)),
+            (SELECT COALESCE(SUM(completion_time), 0) FROM courses),
+            (SELECT COUNT(completion_time) FROM courses)
+    """)
+
+    cursor.execute("DELETE FROM analytics_daily_completions")
+    cursor.execute("""
+        INSERT INTO analytics_daily_completions (completion_date, completed_sections_count)
+        SELECT strftime('%Y-%m-%d', completed_at, 'unixepoch'), COUNT(*)
+        FROM sections
+        WHERE is_completed = 1 AND completed_at IS NOT NULL
+        AND course_id IN (SELECT course_id FROM courses)
+        GROUP BY 1
+    """)
+
+CREATE_SESSION_EVENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS session_events (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    action TEXT NOT NULL,
+    created_at INTEGER,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID
+"""
+
+
+def backfill_session_events(cursor):
+    cursor.execute("SELECT session_id, actions FROM sessions WHERE actions IS NOT NULL")
+    rows = cursor.fetchall()
+    for session_id, actions in rows:
+        cursor.executemany(
+            "INSERT OR IGNORE INTO session_events (session_id, seq, action, created_at) VALUES (?, ?, ?, NULL)",
+            [(session_id, seq, action) for seq, action in enumerate(json.loads(actions or "[]"))]
+        )
+    cursor.execute("UPDATE sessions SET actions = NULL")
+
+CREATE_DATA_VERSIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS data_versions (
+    scope TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID
+"""
+
+CREATE_JOBS_TABLE = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    session_id TEXT,
+    payload TEXT,
+    status TEXT NOT NULL CHECK(status IN ('queued', 'running', 'succeeded', 'failed')),
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    created_at INTEGER,
+    started_at INTEGER,
+    finished_at INTEGER
+)
+"""
+
+CREATE_COURSE_OUTLINES_TABLE = """
+CREATE TABLE IF NOT EXISTS course_outlines (
+    course_id TEXT PRIMARY KEY,
+    outline TEXT NOT NULL,
+    FOREIGN KEY (course_id) REFERENCES courses(course_id)
+)
+"""
+
+CREATE_SEARCH_DOCUMENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS search_documents (
+    doc_id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL CHECK(kind IN ('course', 'section')),
+    course_id TEXT NOT NULL,
+    item_id TEXT NOT NULL UNIQUE
+)
+"""
+
+CREATE_SEARCH_INDEX_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    title,
+    body,
+    tokenize = 'porter unicode61'
+)
+"""
+
+
+def backfill_search_index(cursor):
+    cursor.execute("""
+        INSERT INTO search_documents (kind, course_id, item_id)
+        SELECT 'course', course_id, course_id FROM courses
+    """)
+    cursor.execute("""
+        INSERT INTO search_documents (kind, course_id, item_id)
+        SELECT 'section', course_id, section_id FROM sections
+        WHERE course_id IN (SELECT course_id FROM courses)
+    """)
+    cursor.execute("""
+        INSERT INTO search_index (rowid, title, body)
+        SELECT d.doc_id, c.title, c.description
+        FROM search_documents d JOIN courses c ON c.course_id = d.item_id
+        WHERE d.kind = 'course'
+    """)
+    cursor.execute("""
+        INSERT INTO search_index (rowid, title, body)
+        SELECT d.doc_id, s.title, s.content
+        FROM search_documents d JOIN sections s ON s.section_id = d.item_id
+        WHERE d.kind = 'section'
+    """)
+
+CREATE_SECTION_CONTENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS section_contents (
+    section_id TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    data BLOB,
+    FOREIGN KEY (section_id) REFERENCES sections(section_id)
+)
+"""
+
+CREATE_CONTENTLESS_SEARCH_INDEX_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    title,
+    body,
+    content = '',
+    tokenize = 'porter unicode61'
+)
+"""
+
+
+def compress_section_contents(cursor, batch_size=500):
+    cursor.execute("SELECT section_id FROM sections WHERE content IS NOT NULL")
+    section_ids = [row[0] for row in cursor.fetchall()]
+    for start in range(0, len(section_ids), batch_size):
+        batch = section_ids[start:start + batch_size]
+        placeholders = ", ".join("?" for _ in batch)
+        cursor.execute(f"SELECT section_id, content FROM sections WHERE section_id IN ({placeholders})", batch)
+        cursor.executemany(
+            "INSERT OR REPLACE INTO section_contents (section_id, codec, data) VALUES (?, ?, ?)",
+            [(section_id, *compress_content(content)) for section_id, content in cursor.fetchall()]
+        )
+        cursor.executemany("UPDATE sections SET content = NULL WHERE section_id = ?", [(i,) for i in batch])
+
+
+def rebuild_search_index(cursor):
+    cursor.execute("""
+        INSERT INTO search_index (rowid, title, body)
+        SELECT d.doc_id, c.title, c.description
+        FROM search_documents d JOIN courses c ON c.course_id = d.item_id
+        WHERE d.kind = 'course'
+    """)
+    reader = cursor.connection.cursor()
+    reader.execute("""
+        SELECT d.doc_id, s.title, sc.codec, sc.data
+        FROM search_documents d
+        JOIN sections s ON s.section_id = d.item_id
+        LEFT JOIN section_contents sc ON sc.section_id = s.section_id
+        WHERE d.kind = 'section'
+    """)
+    while rows := reader.fetchmany(500):
+        cursor.executemany(
+            "INSERT INTO search_index (rowid, title, body) VALUES (?, ?, ?)",
+            [(doc_id, title or "", decompress_content(codec, data) or "") for doc_id, title, codec, data in rows]
+        )
+    reader.close()
+
+CREATE_SESSION_METRICS_TABLE = """
+CREATE TABLE IF NOT EXISTS session_metrics (
+    session_id TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    detail TEXT,
+    started_at REAL,
+    duration_ms REAL,
+    input_tokens INTEGER NOT NULL DEFAULT 0,
+    output_tokens INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+CREATE_BATCH_ITEMS_TABLE = """
+CREATE TABLE IF NOT EXISTS batch_items (
+    batch_id TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    line INTEGER,
+    duplicates INTEGER NOT NULL DEFAULT 0,
+    session_id TEXT NOT NULL,
+    description TEXT,
+    level TEXT,
+    status TEXT NOT NULL CHECK(status IN ('pending', 'succeeded', 'failed')),
+    course_id TEXT,
+    error TEXT,
+    duration_ms REAL,
+    updated_at INTEGER,
+    PRIMARY KEY (batch_id, item_key)
+) WITHOUT ROWID
+"""
+
+def rebuild_course_counters(cursor):
+    cursor.execute("""
+        UPDATE courses
+        SET total_sections = (SELECT COUNT(*) FROM sections s WHERE s.course_id = courses.course_id),
+            completed_sections = (
+                SELECT COUNT(*) FROM sections s WHERE s.course_id = courses.course_id AND s.is_completed = 1
+            )
+    """)
+
+CREATE_CASCADING_SECTIONS_TABLE = """
+CREATE TABLE sections_new (
+    course_id TEXT,
+    section_id TEXT PRIMARY KEY,
+    title TEXT,
+    description TEXT,
+    content TEXT,
+    section_order INTEGER,
+    created_at INTEGER,
+    is_completed INTEGER DEFAULT 0,
+    completed_at INTEGER,
+    FOREIGN KEY (course_id) REFERENCES courses(course_id) ON DELETE CASCADE
+)
+"""
+
+CREATE_CASCADING_SECTION_CONTENTS_TABLE = """
+CREATE TABLE section_contents_new (
+    section_id TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    data BLOB,
+    FOREIGN KEY (section_id) REFERENCES sections(section_id) ON DELETE CASCADE
+)
+"""
+
+CREATE_CASCADING_COURSE_OUTLINES_TABLE = """
+CREATE TABLE course_outlines_new (
+    course_id TEXT PRIMARY KEY,
+    outline TEXT NOT NULL,
+    FOREIGN KEY (course_id) REFERENCES courses(course_id) ON DELETE CASCADE
+)
+"""
+
+
+def rebuild_table(table, create_sql, columns):
+    # SQLite cannot alter a foreign key in place, so the table is copied into a new definition.
+    # rowids are copied too, since pagination cursors and the search index refer to them.
+    columns = ", ".join(columns)
+    return [
+        create_sql,
+        f"INSERT INTO {table}_new (rowid, {columns}) SELECT rowid, {columns} FROM {table}",
+        f"DROP TABLE {table}",
+        f"ALTER TABLE {table}_new RENAME TO {table}",
+    ]
+
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def enable_incremental_vacuum(conn):
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+        return
+    # Existing files only switch auto_vacuum mode when rebuilt, which cannot happen inside a transaction.
+    logger.info("Enabling incremental auto-vacuum, rebuilding the database file...")
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+
+# Each migration is a list of SQL strings or callables taking a cursor.
+# Append new migrations; never edit one that has shipped.
+MIGRATIONS = [
+    (1, [CREATE_SESSIONS_TABLE, CREATE_COURSES_TABLE, CREATE_SECTIONS_TABLE, CREATE_RESPONSE_CACHE_TABLE]),
+    (2, CREATE_INDEXES + ["ANALYZE"]),
+    (3, [
+        CREATE_ANALYTICS_TOTALS_TABLE,
+        CREATE_ANALYTICS_DAILY_TABLE,
+        "ALTER TABLE courses ADD COLUMN latest_completed_at INTEGER",
+        "ALTER TABLE courses ADD COLUMN completion_time INTEGER",
+        "CREATE INDEX IF NOT EXISTS idx_courses_title ON courses(title)",
+        rebuild_analytics_rollups,
+    ]),
+    (4, [CREATE_SESSION_EVENTS_TABLE, backfill_session_events]),
+    (5, [CREATE_DATA_VERSIONS_TABLE]),
+    (6, [
+        CREATE_JOBS_TABLE,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_session ON jobs(session_id)",
+    ]),
+    (7, [CREATE_COURSE_OUTLINES_TABLE]),
+    (8, [
+        CREATE_SEARCH_DOCUMENTS_TABLE,
+        "CREATE INDEX IF NOT EXISTS idx_search_documents_course ON search_documents(course_id)",
+        CREATE_SEARCH_INDEX_TABLE,
+        backfill_search_index,
+    ]),
+    (9, [
+        CREATE_SECTION_CONTENTS_TABLE,
+        compress_section_contents,
+        "DROP TABLE IF EXISTS search_index",
+        CREATE_CONTENTLESS_SEARCH_INDEX_TABLE,
+        rebuild_search_index,
+    ]),
+    (10, [
+        CREATE_SESSION_METRICS_TABLE,
+        "CREATE INDEX IF NOT EXISTS idx_session_metrics_session ON session_metrics(session_id, started_at)",
+    ]),
+    (11, [CREATE_BATCH_ITEMS_TABLE]),
+    (12, [
+        "ALTER TABLE courses ADD COLUMN total_sections INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE courses ADD COLUMN completed_sections INTEGER NOT NULL DEFAULT 0",
+        rebuild_course_counters,
+    ]),
+    (13, [
+        *rebuild_table("sections", CREATE_CASCADING_SECTIONS_TABLE, (
+            "course_id", "section_id", "title", "description", "content", "section_order", "created_at",
+            "is_completed", "completed_at"
+        )),
+        "CREATE INDEX IF NOT EXISTS idx_sections_course_order ON sections(course_id, section_order)",
+        "CREATE INDEX IF NOT EXISTS idx_sections_course_completed ON sections(course_id, is_completed, completed_at)",
+        "CREATE INDEX IF NOT EXISTS idx_sections_completed ON sections(is_completed, completed_at)",
+        *rebuild_table("section_contents", CREATE_CASCADING_SECTION_CONTENTS_TABLE, ("section_id", "codec", "data")),
+        *rebuild_table("course_outlines", CREATE_CASCADING_COURSE_OUTLINES_TABLE, ("course_id", "outline")),
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(cursor) -> int:
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+
+def run_migrations(conn) -> int:
     cursor = conn.cursor()
+    current = get_schema_version(cursor)
+    for version, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Applying database migration {version}")
+        cursor.execute(f"SAVEPOINT migration_{version}")
+        try:
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            cursor.execute(f"RELEASE migration_{version}")
+        except Exception:
+            cursor.execute(f"ROLLBACK TO migration_{version}")
+            cursor.execute(f"RELEASE migration_{version}")
+            raise
+        conn.commit()
+        current = version
+    return current
 
-    cursor.execute(CREATE_SESSIONS_TABLE)
-    cursor.execute(CREATE_COURSES_TABLE)
-    cursor.execute(CREATE_SECTIONS_TABLE)
 
-    conn.commit()
-    conn.close()
+def initialise_db(db_name="quip.db"):
+    conn = sqlite3.connect(db_name)
+    try:
+        # Takes effect straight away on a new, empty file.
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        run_migrations(conn)
+        enable_incremental_vacuum(conn)
+    finally:
+        conn.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,48 @@
+import html
+import re
+
+SNIPPET_LENGTH = 200
+
+
+def search_terms(text):
+    return re.findall(r"\w+", text or "")
+
+
+def to_fts_query(text: str) -> str:
+    terms = search_terms(text)
+    if not terms:
+        raise ValueError("Search query must contain at least one word")
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def _term_pattern(terms):
+    # FTS matches on porter stems, so highlight any word sharing a term's leading characters.
+    prefixes = sorted({term[:max(3, len(term) - 2)].lower() for term in terms}, key=len, reverse=True)
+    return re.compile(r"\b(" + "|".join(re.escape(prefix) for prefix in prefixes) + r")\w*", re.IGNORECASE)
+
+
+def highlight(text, terms, start="<mark>", end="</mark>"):
+    if not text:
+        return text
+    # Stored text is escaped piece by piece, so the result is safe to render as HTML with the marks intact.
+    pieces = []
+    last = 0
+    for match in _term_pattern(terms).finditer(text):
+        pieces.append(html.escape(text[last:match.start()]))
+        pieces.append(f"{start}{html.escape(match.group(0))}{end}")
+        last = match.end()
+    pieces.append(html.escape(text[last:]))
+    return "".join(pieces)
+
+
+def make_snippet(text, terms, length=SNIPPET_LENGTH, start="<mark>", end="</mark>"):
+    if not text:
+        return ""
+    match = _term_pattern(terms).search(text)
+    offset = max(0, match.start() - length // 3) if match else 0
+    window = text[offset:offset + length]
+    prefix = "…" if offset > 0 else ""
+    suffix = "…" if offset + length < len(text) else ""
+    return prefix + highlight(window, terms, start, end) + suffix
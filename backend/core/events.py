@@ -0,0 +1,93 @@
+import importlib.util
+import os
+import time
+
+from core.metrics import Metrics
+
+
+def session_room(session_id):
+    return f"session:{session_id}"
+
+
+def message_queue_options():
+    url = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+    if not url:
+        return {}
+    channel = os.getenv("SOCKETIO_CHANNEL", "quip")
+    # Neither client is in requirements.txt: redis:// needs redis, every other queue goes through kombu.
+    package = "redis" if url.startswith(("redis://", "rediss://")) else "kombu"
+    if importlib.util.find_spec(package) is None:
+        raise ValueError(f"SOCKETIO_MESSAGE_QUEUE={url} needs the {package} package (pip install {package})")
+    if not url.startswith("filesystem://"):
+        return {"message_queue": url, "channel": channel}
+
+    # Kombu's filesystem transport: every process on the host shares one folder as the bus.
+    import socketio
+
+    folder = url[len("filesystem://"):] or "socketio-queue"
+    for name in ("data", "control"):
+        os.makedirs(os.path.join(folder, name), exist_ok=True)
+    transport_options = {
+        "data_folder_in": os.path.join(folder, "data"),
+        "data_folder_out": os.path.join(folder, "data"),
+        "control_folder": os.path.join(folder, "control"),
+    }
+    manager = socketio.KombuManager(
+        "filesystem://", channel=channel, connection_options={"transport_options": transport_options}
+    )
+    return {"client_manager": manager}
+
+
+class CreationEvents:
+    def __init__(self, socketio, session_state, db, namespace='/create', metrics=None):
+        self.socketio = socketio
+        self.session_state = session_state
+        self.db = db
+        self.namespace = namespace
+        self.metrics = metrics or Metrics(enabled=False)
+
+    def emit(self, event, payload, session_id):
+        started = time.perf_counter()
+        self.socketio.emit(event, payload, namespace=self.namespace, to=session_room(session_id))
+        self.metrics.observe("quip_socketio_emit_seconds", time.perf_counter() - started, event=event)
+
+    def emit_session_update(self, session_id, actions=None, progress=None, course_id=None):
+        delta = self.session_state.update(session_id, actions=actions, progress=progress, course_id=course_id)
+        if delta is None:
+            return
+        if self.session_state.wants_deltas(session_id):
+            self.emit('session_delta', delta, session_id)
+        else:
+            self.emit('session_update', self.session_state.snapshot(session_id), session_id)
+
+    def emit_session_snapshot(self, session_id):
+        snapshot = self.session_state.snapshot(session_id)
+        if snapshot is None:
+            session = self.db.get_session(session_id)
+            if session is None:
+                self.emit_error(session_id, "Session not found")
+                return
+            snapshot = {**session, "course_id": self.db.get_course_id_for_session(session_id), "seq": None}
+        self.emit('session_snapshot', snapshot, session_id)
+
+    def emit_error(self, session_id, error_message):
+        self.emit('error', {"session_id": session_id, "error": error_message}, session_id)
+
+    def emit_section_chunk(self, session_id, course_id, section_id, section_order, title, chunk):
+        self.emit('section_chunk', {
+            "session_id": session_id,
+            "course_id": course_id,
+            "section_id": section_id,
+            "section_order": section_order,
+            "title": title,
+            "chunk": chunk
+        }, session_id)
+
+    def emit_job_update(self, job):
+        self.emit('job_update', {
+            "job_id": job["job_id"],
+            "session_id": job["session_id"],
+            "status": job["status"],
+            "position": job.get("position"),
+            "error": job.get("error")
+        }, job["session_id"])
@@ -0,0 +1,106 @@
+import copy
+import hashlib
+import itertools
+import os
+import random
+import time
+from types import SimpleNamespace
+
+from agno.run.response import RunEvent
+
+from core.models import CourseOutline, SectionOutline, CourseAuthenticator
+
+WORDS = (
+    "data model function state request cache query index stream thread course section learner example "
+    "concept practice result error value pattern design system network memory process signal"
+).split()
+
+
+class FakeTransientError(Exception):
+    status_code = 503
+
+
+class FakeAgent:
+    def __init__(self, kind, latency_ms=None, jitter_ms=None, sections=None, section_chars=None, chunks=None, seed=None):
+        self.kind = kind
+        self.latency_ms = latency_ms if latency_ms is not None else float(os.getenv("FAKE_LLM_LATENCY_MS", "200"))
+        self.jitter_ms = jitter_ms if jitter_ms is not None else float(os.getenv("FAKE_LLM_JITTER_MS", "50"))
+        self.sections = sections or int(os.getenv("FAKE_LLM_SECTIONS", "5"))
+        self.section_chars = section_chars or int(os.getenv("FAKE_LLM_SECTION_CHARS", "4000"))
+        self.chunks = chunks or int(os.getenv("FAKE_LLM_STREAM_CHUNKS", "20"))
+        self.seed = seed if seed is not None else os.getenv("FAKE_LLM_SEED", "0")
+        self.error_rate = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+        self.run_response = None
+        self._calls = itertools.count()
+
+    def deep_copy(self):
+        return copy.copy(self)
+
+    def _rng(self, prompt):
+        digest = hashlib.sha256(f"{self.seed}:{self.kind}:{prompt}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _latency(self, rng):
+        return max(0.0, self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    def _text(self, rng, length):
+        words = []
+        size = 0
+        while size < length:
+            word = rng.choice(WORDS)
+            words.append(word)
+            size += len(word) + 1
+        return " ".join(words)[:length]
+
+    def _content(self, prompt, rng):
+        if self.kind == "validator":
+            return CourseAuthenticator(is_valid_course_request=True)
+        if self.kind == "outline":
+            return CourseOutline(
+                course_title=f"Course {self._text(rng, 30)}",
+                course_description=self._text(rng, 200),
+                sections=[
+                    SectionOutline(section_title=f"Section {i + 1}: {self._text(rng, 24)}", section_description=self._text(rng, 300))
+                    for i in range(self.sections)
+                ]
+            )
+        return f"# {prompt[:40]}\n\n{self._text(rng, self.section_chars)}"
+
+    def _metrics(self, prompt, content, latency):
+        output = content if isinstance(content, str) else content.model_dump_json()
+        return {
+            "input_tokens": [len(prompt) // 4],
+            "output_tokens": [len(output) // 4],
+            "time": [latency],
+        }
+
+    def _should_fail(self):
+        if not self.error_rate:
+            return False
+        call = next(self._calls)
+        digest = hashlib.sha256(f"{self.seed}:{self.kind}:error:{call}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:4], "big") / 2 ** 32 < self.error_rate
+
+    def run(self, prompt, stream=False):
+        if self._should_fail():
+            raise FakeTransientError(f"Fake {self.kind} backend unavailable (503)")
+        rng = self._rng(prompt)
+        latency = self._latency(rng)
+        content = self._content(prompt, rng)
+        self.run_response = SimpleNamespace(
+            content=content, event=RunEvent.run_response.value, metrics=self._metrics(prompt, content, latency)
+        )
+        if not stream:
+            time.sleep(latency)
+            return self.run_response
+        return self._stream(content, latency)
+
+    def _stream(self, content, latency):
+        size = max(1, -(-len(content) // self.chunks))
+        for start in range(0, len(content), size):
+            time.sleep(latency / self.chunks)
+            yield SimpleNamespace(content=content[start:start + size], event=RunEvent.run_response.value, metrics=None)
+
+
+def build_fake_agents():
+    return FakeAgent("outline"), FakeAgent("validator"), FakeAgent("section")
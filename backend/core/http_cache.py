@@ -0,0 +1,35 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+def make_etag(key: str, scope: str, version: int) -> str:
+    return hashlib.sha1(f"{key}|{scope}|{version}".encode("utf-8")).hexdigest()[:20]
+
+
+class VersionedResponseCache:
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or int(os.getenv("HTTP_CACHE_SIZE", "512"))
+        self.enabled = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, version: int):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, version: int, body):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,176 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from core.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(self, db, on_update=None, on_release=None, workers=None, max_queued=None, poll_interval=None, metrics=None):
+        self.db = db
+        self.on_update = on_update
+        self.on_release = on_release
+        self.metrics = metrics or Metrics(enabled=False)
+        self.workers = workers if workers is not None else int(os.getenv("JOB_WORKERS", "4"))
+        self.max_queued = max_queued or int(os.getenv("JOB_MAX_QUEUED", "100"))
+        self.poll_interval = poll_interval or float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+        self.stale_after = int(os.getenv("JOB_STALE_SECONDS", "3600"))
+        self.stale_check_interval = float(os.getenv("JOB_STALE_CHECK_INTERVAL", "60"))
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.handlers = {}
+        self._available = threading.Semaphore(0)
+        self._stop = threading.Event()
+        self._threads = []
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+        self._next_stale_check = 0.0
+        self._stale_check_lock = threading.Lock()
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    def enqueue(self, kind, payload, session_id=None):
+        job_id = str(uuid.uuid4())
+        active = None
+        with self.db.transaction():
+            # Two jobs for one session would both resume it and write the same sections, so a repeat attaches instead.
+            if session_id:
+                active = self.db.get_active_job_for_session(session_id)
+            if active:
+                job_id = active["job_id"]
+            elif self.db.count_jobs(("queued",)) >= self.max_queued:
+                raise QueueFullError("Job queue is full")
+            else:
+                self.db.create_job(job_id, kind, session_id, payload)
+        if not active:
+            self._available.release()
+
+        job = self.db.get_job(job_id)
+        job["position"] = self.db.get_job_queue_position(job_id)
+        self._notify(job)
+        return job
+
+    def _is_stale(self, job, now, startup=False):
+        host, _, pid = (job["worker_id"] or "").rpartition(":")
+        if host == socket.gethostname() and pid.isdigit():
+            # Our own id is only left over from an earlier process at startup; later it means a sibling thread is running it.
+            if job["worker_id"] == self.worker_id:
+                return startup
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                return True
+            except PermissionError:
+                pass
+            return False
+        return now - (job["started_at"] or 0) > self.stale_after
+
+    def recover_stale_jobs(self, startup=False):
+        now = int(time.time())
+        jobs = [job for job in self.db.get_running_jobs() if self._is_stale(job, now, startup)]
+        stale = [job["job_id"] for job in jobs]
+        if stale:
+            self.db.requeue_jobs(stale)
+            logger.info(f"Requeued {len(stale)} jobs left running by dead workers.")
+            for job in jobs:
+                self._release(job)
+        return stale
+
+    def _maybe_recover_stale_jobs(self):
+        # Workers on other processes can die at any time, so idle workers keep looking, one at a time.
+        now = time.monotonic()
+        if now < self._next_stale_check or not self._stale_check_lock.acquire(blocking=False):
+            return
+        try:
+            self._next_stale_check = now + self.stale_check_interval
+            self.recover_stale_jobs()
+        except Exception:
+            logger.exception("Failed to recover stale jobs.")
+        finally:
+            self._stale_check_lock.release()
+
+    def start(self):
+        self.recover_stale_jobs(startup=True)
+        self._next_stale_check = time.monotonic() + self.stale_check_interval
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Started {self.workers} job workers ({self.worker_id})")
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for _ in self._threads:
+            self._available.release()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            job = self.db.claim_next_job(self.worker_id)
+            if job is None:
+                self._maybe_recover_stale_jobs()
+                self._available.acquire(timeout=self.poll_interval)
+                continue
+            with self._busy_lock:
+                self._busy += 1
+            try:
+                self._run(job)
+            finally:
+                with self._busy_lock:
+                    self._busy -= 1
+
+    @property
+    def busy_workers(self):
+        return self._busy
+
+    def _run(self, job):
+        now = time.time()
+        waited = max(0.0, now - (job["created_at"] or now))
+        self.metrics.observe("quip_job_wait_seconds", waited)
+        self.metrics.record(job["session_id"], "queue_wait", now - waited, waited, detail=job["job_id"])
+
+        self._notify(job)
+        handler = self.handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job kind '{job['kind']}'")
+            handler(job["payload"])
+            self.db.finish_job(job["job_id"], "succeeded")
+        except Exception as e:
+            logger.warning(f"Job {job['job_id']} failed: {e}")
+            self.db.finish_job(job["job_id"], "failed", str(e))
+            self._release(job)
+        self._notify(self.db.get_job(job["job_id"]))
+
+    def _release(self, job):
+        if self.on_release and job["session_id"]:
+            try:
+                self.on_release(job)
+            except Exception:
+                logger.exception(f"Failed to release state for job {job['job_id']}.")
+
+    def _notify(self, job):
+        if self.on_update and job:
+            try:
+                self.on_update(job)
+            except Exception:
+                logger.exception(f"Failed to publish update for job {job['job_id']}.")
+
+    def get_stats(self):
+        return {
+            "worker_id": self.worker_id,
+            "workers": len(self._threads),
+            "max_queued": self.max_queued,
+            "counts": self.db.get_job_counts(),
+        }
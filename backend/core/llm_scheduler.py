@@ -0,0 +1,191 @@
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from core.metrics import Metrics, token_usage
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_VALIDATION = 0
+PRIORITY_OUTLINE = 1
+PRIORITY_SECTION = 2
+
+ESTIMATED_OUTPUT_TOKENS = {"validator": 16, "outline": 1500, "section": 2500}
+
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_MARKERS = ("429", "rate limit", "resource_exhausted", "unavailable", "deadline_exceeded", "overloaded", "timed out")
+
+
+def is_transient_error(error) -> bool:
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    for attr in ("status_code", "code"):
+        if getattr(error, attr, None) in TRANSIENT_STATUS_CODES:
+            return True
+    message = str(error).lower()
+    return any(marker in message for marker in TRANSIENT_MARKERS)
+
+
+def estimate_tokens(agent, prompt) -> int:
+    return len(prompt or "") // 4 + ESTIMATED_OUTPUT_TOKENS.get(agent, 1000)
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now) -> float:
+        self._refill(now)
+        # A request larger than the whole bucket only has to wait for a full bucket.
+        needed = min(amount, self.capacity) - self.tokens
+        return max(0.0, needed / self.rate) if self.rate else 0.0
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.tokens -= amount
+
+    def refund(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency=None, requests_per_minute=None, tokens_per_minute=None,
+                 max_retries=None, base_delay=None, max_delay=None, metrics=None):
+        self.max_concurrency = max_concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        requests_per_minute = requests_per_minute if requests_per_minute is not None else int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+        tokens_per_minute = tokens_per_minute if tokens_per_minute is not None else int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("LLM_MAX_RETRIES", "3"))
+        self.base_delay = base_delay if base_delay is not None else float(os.getenv("LLM_RETRY_BASE_DELAY", "1.0"))
+        self.max_delay = max_delay if max_delay is not None else float(os.getenv("LLM_RETRY_MAX_DELAY", "30.0"))
+        self.metrics = metrics or Metrics(enabled=False)
+
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self.stats = {"calls": 0, "retries": 0, "failures": 0}
+
+    def _wait_time(self, tokens, now):
+        wait = 0.0
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.wait_time(1, now))
+        if self.token_bucket:
+            wait = max(wait, self.token_bucket.wait_time(tokens, now))
+        return wait
+
+    @contextmanager
+    def _slot(self, agent, priority, tokens):
+        entry = (priority, next(self._sequence))
+        started = time.perf_counter()
+        with self._condition:
+            heapq.heappush(self._waiting, entry)
+            try:
+                while True:
+                    timeout = None
+                    if self._waiting[0] == entry and self._in_flight < self.max_concurrency:
+                        now = time.monotonic()
+                        timeout = self._wait_time(tokens, now)
+                        if timeout <= 0:
+                            break
+                    self._condition.wait(timeout)
+            except BaseException:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+                raise
+
+            heapq.heappop(self._waiting)
+            now = time.monotonic()
+            if self.request_bucket:
+                self.request_bucket.consume(1, now)
+            if self.token_bucket:
+                self.token_bucket.consume(tokens, now)
+            self._in_flight += 1
+            self._condition.notify_all()
+        self.metrics.observe("quip_llm_queue_seconds", time.perf_counter() - started, agent=agent)
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def _settle_tokens(self, estimated, result):
+        if not self.token_bucket:
+            return
+        input_tokens, output_tokens = token_usage(getattr(result, "metrics", None))
+        actual = input_tokens + output_tokens
+        if not actual:
+            return
+        with self._condition:
+            if actual > estimated:
+                self.token_bucket.consume(actual - estimated, time.monotonic())
+            else:
+                self.token_bucket.refund(estimated - actual)
+            self._condition.notify_all()
+
+    def _backoff(self, attempt) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, agent, fn, priority, prompt=None, can_retry=None):
+        tokens = estimate_tokens(agent, prompt)
+        attempt = 0
+        while True:
+            with self._slot(agent, priority, tokens):
+                try:
+                    result = fn()
+                except Exception as e:
+                    error = e
+                else:
+                    self._count("calls")
+                    self._settle_tokens(tokens, result)
+                    return result
+
+            retryable = is_transient_error(error) and (can_retry is None or can_retry())
+            if not retryable or attempt >= self.max_retries:
+                self._count("failures")
+                raise error
+            delay = self._backoff(attempt)
+            attempt += 1
+            self._count("retries")
+            self.metrics.inc("quip_llm_retries_total", agent=agent)
+            logger.warning(f"Transient {agent} LLM error, retry {attempt}/{self.max_retries} in {delay:.1f}s: {error}")
+            time.sleep(delay)
+
+    def _count(self, stat):
+        with self._condition:
+            self.stats[stat] += 1
+
+    @property
+    def queued(self):
+        return len(self._waiting)
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    def get_stats(self):
+        with self._condition:
+            return {
+                **self.stats,
+                "queued": len(self._waiting),
+                "in_flight": self._in_flight,
+                "max_concurrency": self.max_concurrency,
+                "requests_per_minute": self.request_bucket.capacity if self.request_bucket else None,
+                "tokens_per_minute": self.token_bucket.capacity if self.token_bucket else None,
+            }
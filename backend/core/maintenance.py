@@ -0,0 +1,95 @@
+import logging
+import os
+import threading
+import time
+
+from core.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Sweeper:
+    def __init__(self, db, interval=None, abandon_after=None, vacuum_pages=None, metrics=None):
+        self.db = db
+        self.metrics = metrics or Metrics(enabled=False)
+        self.interval = interval if interval is not None else float(os.getenv("DB_SWEEP_INTERVAL", "3600"))
+        self.abandon_after = abandon_after if abandon_after is not None else int(os.getenv("SESSION_ABANDON_AFTER", "86400"))
+        self.vacuum_pages = vacuum_pages or int(os.getenv("DB_VACUUM_PAGES", "1000"))
+        self.last_result = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self.interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._loop, name="db-sweeper", daemon=True)
+        self._thread.start()
+        logger.info(f"Database sweeper running every {self.interval:.0f}s")
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Database sweep failed.")
+
+    def sweep(self):
+        with self._lock:
+            started = time.perf_counter()
+            abandoned = self.sweep_abandoned_sessions()
+            orphans = self.db.sweep_orphans()
+            reclaimed = self.reclaim_space()
+
+            for kind, count in {"abandoned_sessions": abandoned, **orphans}.items():
+                if count:
+                    self.metrics.inc("quip_db_swept_rows_total", count, kind=kind)
+            self.last_result = {
+                "abandoned_sessions": abandoned,
+                "orphans": orphans,
+                "reclaimed_pages": reclaimed,
+                "duration_s": time.perf_counter() - started,
+                "finished_at": int(time.time()),
+            }
+            if abandoned or reclaimed or any(orphans.values()):
+                logger.info(
+                    f"Swept {abandoned} abandoned sessions and {sum(orphans.values())} orphaned rows, "
+                    f"reclaimed {reclaimed} pages."
+                )
+            return self.last_result
+
+    def sweep_abandoned_sessions(self):
+        inactive_since = int(time.time()) - self.abandon_after
+        deleted = 0
+        while True:
+            session_ids = self.db.get_abandoned_sessions(inactive_since)
+            if not session_ids:
+                return deleted
+            removed = sum(1 for session_id in session_ids if self.db.delete_session(session_id))
+            if not removed:
+                return deleted
+            deleted += removed
+
+    def reclaim_space(self):
+        # Free pages are handed back in chunks so the write lock is never held for the whole file.
+        reclaimed = 0
+        while self.db.get_storage_stats()["freelist_count"] > 0:
+            freed = self.db.incremental_vacuum(self.vacuum_pages)
+            if freed <= 0:
+                break
+            reclaimed += freed
+        return reclaimed
+
+    def get_stats(self):
+        return {
+            "interval_s": self.interval,
+            "abandon_after_s": self.abandon_after,
+            "storage": self.db.get_storage_stats(),
+            "last_sweep": self.last_result,
+        }
@@ -0,0 +1,243 @@
+import inspect
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+METRICS = {
+    "quip_stage_seconds": ("histogram", "Duration of course creation pipeline stages."),
+    "quip_llm_seconds": ("histogram", "Latency of LLM calls per agent."),
+    "quip_llm_tokens_total": ("counter", "Tokens consumed by LLM calls per agent and direction."),
+    "quip_llm_calls_total": ("counter", "LLM calls per agent and outcome."),
+    "quip_llm_in_flight": ("gauge", "LLM calls currently running per agent."),
+    "quip_llm_queue_seconds": ("histogram", "Time LLM calls waited in the scheduler per agent."),
+    "quip_llm_retries_total": ("counter", "LLM calls retried after transient errors per agent."),
+    "quip_llm_queued": ("gauge", "LLM calls waiting in the scheduler."),
+    "quip_db_query_seconds": ("histogram", "Latency of Database methods."),
+    "quip_db_commit_seconds": ("histogram", "Time spent committing write transactions."),
+    "quip_db_write_lock_wait_seconds": ("histogram", "Time spent waiting for the write connection."),
+    "quip_socketio_emit_seconds": ("histogram", "Time spent emitting Socket.IO events."),
+    "quip_job_wait_seconds": ("histogram", "Time jobs spent queued before a worker claimed them."),
+    "quip_jobs": ("gauge", "Jobs per status."),
+    "quip_job_workers_busy": ("gauge", "Job workers currently running a job."),
+    "quip_db_swept_rows_total": ("counter", "Rows removed by the database sweeper per kind."),
+    "quip_db_free_pages": ("gauge", "Unused pages in the database file waiting to be reclaimed."),
+}
+
+
+def token_usage(response_metrics):
+    if not response_metrics:
+        return 0, 0
+    if not isinstance(response_metrics, dict):
+        response_metrics = vars(response_metrics)
+
+    def total(key):
+        value = response_metrics.get(key) or 0
+        return sum(value) if isinstance(value, (list, tuple)) else value
+
+    return int(total("input_tokens")), int(total("output_tokens"))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class Metrics:
+    def __init__(self, enabled=None, buckets=DEFAULT_BUCKETS):
+        if enabled is None:
+            enabled = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+        self.enabled = enabled
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._in_flight = defaultdict(int)
+        self._gauges = {}
+        self._session_records = defaultdict(list)
+        self._local = threading.local()
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def observe(self, name, seconds, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    histogram[i] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def gauge(self, name, callback, label=None):
+        self._gauges[name] = (callback, label)
+
+    @contextmanager
+    def bind_session(self, session_id):
+        previous = getattr(self._local, "session_id", None)
+        self._local.session_id = session_id
+        try:
+            yield
+        finally:
+            self._local.session_id = previous
+
+    def _session(self, session_id):
+        return session_id or getattr(self._local, "session_id", None)
+
+    def record(self, session_id, stage, started_at, seconds, detail=None, input_tokens=0, output_tokens=0):
+        session_id = self._session(session_id)
+        if not self.enabled or not session_id:
+            return
+        with self._lock:
+            self._session_records[session_id].append({
+                "stage": stage,
+                "detail": detail,
+                "started_at": started_at,
+                "duration_ms": seconds * 1000,
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+            })
+
+    def pop_session_records(self, session_id):
+        with self._lock:
+            return self._session_records.pop(session_id, [])
+
+    def move_session_records(self, source, target):
+        with self._lock:
+            records = self._session_records.pop(source, [])
+            if records:
+                self._session_records[target].extend(records)
+
+    @contextmanager
+    def span(self, stage, session_id=None, detail=None, record=True):
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe("quip_stage_seconds", seconds, stage=stage)
+            if record:
+                self.record(session_id, stage, started_at, seconds, detail=detail)
+
+    @contextmanager
+    def llm_call(self, agent, session_id=None, detail=None):
+        call = {"metrics": None}
+        started_at = time.time()
+        start = time.perf_counter()
+        outcome = "error"
+        with self._lock:
+            self._in_flight[agent] += 1
+        try:
+            yield call
+            outcome = "ok"
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                self._in_flight[agent] -= 1
+            input_tokens, output_tokens = token_usage(call["metrics"])
+            self.observe("quip_llm_seconds", seconds, agent=agent)
+            self.inc("quip_llm_calls_total", agent=agent, outcome=outcome)
+            self.inc("quip_llm_tokens_total", input_tokens, agent=agent, direction="input")
+            self.inc("quip_llm_tokens_total", output_tokens, agent=agent, direction="output")
+            self.record(session_id, f"llm:{agent}", started_at, seconds, detail, input_tokens, output_tokens)
+
+    def instrument(self, obj, name, exclude=()):
+        if not self.enabled:
+            return obj
+        for attr in dir(obj):
+            method = getattr(obj, attr)
+            if attr.startswith("_") or attr in exclude or not callable(method):
+                continue
+            setattr(obj, attr, self._timed(name, attr, method))
+        return obj
+
+    def _timed(self, name, method_name, method):
+        if inspect.isgeneratorfunction(method):
+            return self._timed_generator(name, method_name, method)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.observe(name, time.perf_counter() - start, method=method_name)
+        return timed
+
+    def _timed_generator(self, name, method_name, method):
+        # Only time spent producing items counts, not the time the consumer holds each one.
+        def timed(*args, **kwargs):
+            generator = method(*args, **kwargs)
+            elapsed = 0.0
+            try:
+                while True:
+                    start = time.perf_counter()
+                    try:
+                        item = next(generator)
+                    except StopIteration:
+                        return
+                    finally:
+                        elapsed += time.perf_counter() - start
+                    yield item
+            finally:
+                generator.close()
+                self.observe(name, elapsed, method=method_name)
+        return timed
+
+    def _collect_gauges(self):
+        values = defaultdict(dict)
+        with self._lock:
+            for agent, count in self._in_flight.items():
+                values["quip_llm_in_flight"][(("agent", agent),)] = count
+        for name, (callback, label) in self._gauges.items():
+            result = callback()
+            if label:
+                values[name].update({((label, key),): value for key, value in result.items()})
+            else:
+                values[name][()] = result
+        return values
+
+    def render(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+        gauges = self._collect_gauges()
+
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+            elif kind == "gauge":
+                for labels, value in sorted(gauges.get(name, {}).items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            else:
+                for (metric, labels), histogram in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    for bound, count in zip(self.buckets, histogram):
+                        lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram[-1]}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram[-2]}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
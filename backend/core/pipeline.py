@@ -0,0 +1,287 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+from agno.run.response import RunEvent
+
+from core.llm_scheduler import LLMScheduler, PRIORITY_OUTLINE, PRIORITY_SECTION
+from core.metrics import Metrics
+from core.models import CourseOutline
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidCourseRequest(Exception):
+    pass
+
+
+class OutlineAborted(Exception):
+    pass
+
+
+class CoursePipeline:
+    def __init__(self, db, response_cache, request_validator, session_state, events, outline_agent, section_agent, metrics=None, scheduler=None):
+        self.db = db
+        self.response_cache = response_cache
+        self.request_validator = request_validator
+        self.session_state = session_state
+        self.events = events
+        self.outline_agent = outline_agent
+        self.section_agent = section_agent
+        self.metrics = metrics or Metrics(enabled=False)
+        self.scheduler = scheduler or LLMScheduler(metrics=self.metrics)
+
+        self.section_concurrency = max(1, int(os.getenv("SECTION_CONCURRENCY", "4")))
+        self.speculative_outline = os.getenv("SPECULATIVE_OUTLINE", "true").lower() == "true"
+        self.speculation_executor = ThreadPoolExecutor(max_workers=int(os.getenv("SPECULATION_WORKERS", "4")))
+
+    def generate_outline(self, description, level, session_id=None, abort=None) -> CourseOutline:
+        prompt = f"Course Description: {description} \n\n Level: {level}"
+
+        def call():
+            # A speculative outline waits in the scheduler queue, so it is dropped there if the request was rejected.
+            if abort is not None and abort.is_set():
+                raise OutlineAborted()
+            with self.metrics.llm_call("outline", session_id) as usage:
+                response = self.outline_agent.deep_copy().run(prompt)
+                usage["metrics"] = response.metrics
+            return response
+
+        return self.scheduler.call("outline", call, PRIORITY_OUTLINE, prompt=prompt).content
+
+    def generate_section_content(self, section, stream, session_id, course_id, section_id, section_order):
+        prompt = section.section_description
+        chunks = []
+
+        def call():
+            agent = self.section_agent.deep_copy()
+            with self.metrics.llm_call("section", session_id, detail=str(section_order)) as usage:
+                if not stream:
+                    response = agent.run(prompt)
+                    usage["metrics"] = response.metrics
+                    return response
+
+                for response in agent.run(prompt, stream=True):
+                    if response.event != RunEvent.run_response.value or not response.content:
+                        continue
+                    chunks.append(response.content)
+                    self.events.emit_section_chunk(
+                        session_id, course_id, section_id, section_order, section.section_title, response.content
+                    )
+                usage["metrics"] = getattr(agent.run_response, "metrics", None)
+                return agent.run_response
+
+        # Chunks already sent to the client can't be taken back, so a stream is only retried before its first chunk.
+        response = self.scheduler.call("section", call, PRIORITY_SECTION, prompt=prompt, can_retry=lambda: not chunks)
+        return "".join(chunks) if stream else response.content
+
+    def run(self, session_id, description, level, stream=False, deltas=False, group_writes=False):
+        try:
+            with self.metrics.bind_session(session_id), self.metrics.span("run"):
+                self._run(session_id, description, level, stream, deltas, group_writes)
+        except InvalidCourseRequest as e:
+            self.events.emit_error(session_id, str(e))
+            raise
+        except Exception:
+            logger.exception(f"Course creation failed for session {session_id}.")
+            if self.db.update_session_progress(session_id, 'error'):
+                self.events.emit_session_update(session_id, progress='error')
+            self.events.emit_error(session_id, "Course creation failed. Please try again.")
+            raise
+        finally:
+            self._save_metrics(session_id)
+
+    def _save_metrics(self, session_id):
+        records = self.metrics.pop_session_records(session_id)
+        if not records:
+            return
+        try:
+            self.db.save_session_metrics(session_id, records)
+        except Exception:
+            logger.exception(f"Failed to save metrics for session {session_id}.")
+
+    def _speculate_outline(self, description, level, session_id, abort):
+        records_key = f"{session_id}:speculative"
+        try:
+            return self.generate_outline(description, level, records_key, abort=abort)
+        finally:
+            if abort.is_set():
+                self.metrics.pop_session_records(records_key)
+
+    def _start_session(self, session_id, description, level, deltas):
+        course_outline = None
+        speculative_outline = None
+        abort = threading.Event()
+        accepted = False
+        try:
+            with self.metrics.span("validate"):
+                is_valid = self.request_validator.check(description)
+                if is_valid is None:
+                    if self.speculative_outline:
+                        course_outline = self.response_cache.get_outline(description, level)
+                        if course_outline is None:
+                            speculative_outline = self.speculation_executor.submit(
+                                self._speculate_outline, description, level, session_id, abort
+                            )
+                    is_valid = self.request_validator.validate_with_llm(description)
+
+            if not is_valid:
+                raise InvalidCourseRequest("Invalid course description. Please provide a valid course request.")
+
+            self.db.create_session(session_id, [], description, level, 'in_progress')
+            self.session_state.start(session_id, description, level, deltas=deltas)
+            self.events.emit_session_update(session_id)
+
+            action = "Creating course details"
+            self.db.add_session_action(session_id, action)
+            self.events.emit_session_update(session_id, actions=[action])
+            accepted = True
+
+            if speculative_outline:
+                with self.metrics.span("outline", detail="speculative"):
+                    course_outline = speculative_outline.result()
+                self.response_cache.set_outline(description, level, course_outline)
+            return course_outline
+        finally:
+            if speculative_outline and accepted:
+                self.metrics.move_session_records(f"{session_id}:speculative", session_id)
+            elif speculative_outline:
+                # The LLM call cannot be interrupted once it is running; its result and metrics are discarded instead.
+                abort.set()
+                speculative_outline.cancel()
+                self.metrics.pop_session_records(f"{session_id}:speculative")
+
+    def _resume_session(self, session, deltas):
+        session_id = session["session_id"]
+        action = "Resuming course creation"
+        with self.db.transaction():
+            self.db.update_session_progress(session_id, 'in_progress')
+            self.db.add_session_action(session_id, action)
+        self.session_state.start(
+            session_id, session["description"], session["level"], actions=session["actions"], deltas=deltas
+        )
+        self.events.emit_session_update(session_id, actions=[action])
+
+    def _load_outline(self, course, description, level):
+        outline = self.db.get_course_outline(course["course_id"])
+        if outline:
+            return CourseOutline.model_validate_json(outline)
+
+        course_outline = self.response_cache.get_outline(description, level)
+        if course_outline is None:
+            with self.metrics.span("outline"):
+                course_outline = self.generate_outline(description, level)
+        self.db.set_course_outline(course["course_id"], course_outline.model_dump_json())
+        return course_outline
+
+    def _write_section(self, session_id, course_id, created_at, i, section, section_id, content, from_cache):
+        if not from_cache:
+            self.response_cache.set_section(section.section_description, content)
+        self.db.create_section(
+            section_id=section_id,
+            course_id=course_id,
+            title=section.section_title,
+            description=section.section_description,
+            content=content,
+            section_order=i,
+            created_at=created_at
+        )
+        action = f"Section created: {section.section_title}"
+        self.db.add_session_action(session_id, action)
+        return action
+
+    def _run(self, session_id, description, level, stream, deltas, group_writes=False):
+        events = self.events
+        db = self.db
+
+        course = None
+        course_outline = None
+        session = db.get_session(session_id)
+        if session is None:
+            course_outline = self._start_session(session_id, description, level, deltas)
+        else:
+            self._resume_session(session, deltas)
+            description, level = session["description"], session["level"]
+            course = db.get_course_for_session(session_id)
+
+        if course is None:
+            if course_outline is None:
+                course_outline = self.response_cache.get_outline(description, level)
+            if course_outline is None:
+                with self.metrics.span("outline"):
+                    course_outline = self.generate_outline(description, level)
+                self.response_cache.set_outline(description, level, course_outline)
+
+            course_id = str(uuid.uuid4())
+            created_at = int(time.time())
+            action = "Course outline created"
+            with self.metrics.span("create_course"), db.transaction():
+                db.create_course(
+                    course_id, session_id, course_outline.course_title, course_outline.course_description, level,
+                    created_at, outline=course_outline.model_dump_json()
+                )
+                db.add_session_action(session_id, action)
+            events.emit_session_update(session_id, actions=[action], course_id=course_id)
+            existing_orders = set()
+        else:
+            course_id = course["course_id"]
+            created_at = course["created_at"]
+            course_outline = self._load_outline(course, description, level)
+            existing_orders = db.get_section_orders(course_id)
+            events.emit_session_update(session_id, course_id=course_id)
+
+        pending = [
+            (i, section) for i, section in enumerate(course_outline.sections) if i not in existing_orders
+        ]
+        section_actions = [f"Creating section: {section.section_title}" for _, section in pending]
+        db.append_session_actions(session_id, section_actions)
+        events.emit_session_update(session_id, actions=section_actions)
+
+        # Grouped writes (batch mode) commit all sections together at the end instead of one transaction each.
+        grouped = []
+        with self.metrics.span("sections"), ThreadPoolExecutor(max_workers=self.section_concurrency) as executor:
+            futures = {}
+            for i, section in pending:
+                section_id = str(uuid.uuid4())
+                cached_content = self.response_cache.get_section(section.section_description)
+                if cached_content is not None:
+                    future = Future()
+                    future.set_result(cached_content)
+                    if stream:
+                        events.emit_section_chunk(
+                            session_id, course_id, section_id, i, section.section_title, cached_content
+                        )
+                else:
+                    future = executor.submit(
+                        self.generate_section_content, section, stream, session_id, course_id, section_id, i
+                    )
+                futures[future] = (i, section_id, cached_content is not None)
+
+            for future in as_completed(futures):
+                i, section_id, from_cache = futures[future]
+                section = course_outline.sections[i]
+                section_content = future.result()
+                if group_writes:
+                    # Cached right away, so an interrupted course reuses the sections it already paid for.
+                    if not from_cache:
+                        self.response_cache.set_section(section.section_description, section_content)
+                    grouped.append((i, section, section_id, section_content, True))
+                    continue
+                with self.metrics.span("section_write", detail=str(i)), db.transaction():
+                    action = self._write_section(
+                        session_id, course_id, created_at, i, section, section_id, section_content, from_cache
+                    )
+                events.emit_session_update(session_id, actions=[action])
+
+        action = "Course creation completed!"
+        with self.metrics.span("complete"), db.transaction():
+            section_actions = [
+                self._write_section(session_id, course_id, created_at, *item) for item in sorted(grouped, key=lambda item: item[0])
+            ]
+            db.add_session_action(session_id, action)
+            db.update_session_progress(session_id, 'success')
+
+        events.emit_session_update(session_id, actions=section_actions + [action], progress='success')
@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+
+from core.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+
+def service(build):
+    name = build.__name__
+
+    def get(self):
+        try:
+            return self._instances[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._instances:
+                started = time.perf_counter()
+                self._instances[name] = build(self)
+                logger.debug(f"Built {name} in {(time.perf_counter() - started) * 1000:.1f}ms")
+            return self._instances[name]
+
+    return property(get)
+
+
+class Services:
+    # Everything is built on first use, so a process that only serves REST reads never
+    # imports the LLM stack, and importing the app does not open the database.
+    def __init__(self, socketio=None):
+        self.socketio = socketio
+        self._instances = {}
+        self._lock = threading.RLock()
+        self._started = False
+
+    def is_built(self, name) -> bool:
+        return name in self._instances
+
+    @service
+    def metrics(self):
+        return Metrics()
+
+    @service
+    def db(self):
+        from core.database.db import Database
+
+        db = Database()
+        db.metrics = self.metrics
+        self.metrics.instrument(db, "quip_db_query_seconds", exclude=("transaction",))
+        self.metrics.gauge("quip_db_free_pages", lambda: db.get_storage_stats()["freelist_count"])
+        return db
+
+    @service
+    def response_cache(self):
+        from core.cache import ResponseCache
+        return ResponseCache(self.db)
+
+    @service
+    def session_state(self):
+        from core.session_state import SessionStateStore
+        return SessionStateStore()
+
+    @service
+    def http_cache(self):
+        from core.http_cache import VersionedResponseCache
+        return VersionedResponseCache()
+
+    @service
+    def agents(self):
+        from core.agents import build_agents
+        return build_agents()
+
+    @service
+    def llm_scheduler(self):
+        from core.llm_scheduler import LLMScheduler
+
+        scheduler = LLMScheduler(metrics=self.metrics)
+        self.metrics.gauge("quip_llm_queued", lambda: scheduler.queued)
+        return scheduler
+
+    @service
+    def request_validator(self):
+        from core.validation import CourseRequestValidator
+
+        _, course_validator, _ = self.agents
+        return CourseRequestValidator(
+            course_validator, self.response_cache, metrics=self.metrics, scheduler=self.llm_scheduler
+        )
+
+    @service
+    def events(self):
+        from core.events import CreationEvents
+        return CreationEvents(self.socketio, self.session_state, self.db, metrics=self.metrics)
+
+    @service
+    def pipeline(self):
+        from core.pipeline import CoursePipeline
+
+        outline_agent, _, section_agent = self.agents
+        return CoursePipeline(
+            self.db, self.response_cache, self.request_validator, self.session_state, self.events,
+            outline_agent, section_agent, metrics=self.metrics, scheduler=self.llm_scheduler
+        )
+
+    @service
+    def batch_runner(self):
+        from core.batch import BatchRunner
+        return BatchRunner(self.db, self.pipeline)
+
+    @service
+    def job_queue(self):
+        from core.jobs import JobQueue
+
+        queue = JobQueue(
+            self.db, on_update=self.events.emit_job_update,
+            on_release=lambda job: self.session_state.discard_in_progress(job["session_id"]), metrics=self.metrics
+        )
+        queue.register("create_course", lambda payload: self.pipeline.run(**payload))
+        queue.register(
+            "create_batch",
+            lambda payload: self.batch_runner.run(payload["batch_id"], parallelism=payload.get("parallelism"))
+        )
+        self.metrics.gauge("quip_jobs", self.db.get_job_counts, label="status")
+        self.metrics.gauge("quip_job_workers_busy", lambda: queue.busy_workers)
+        return queue
+
+    @service
+    def sweeper(self):
+        from core.maintenance import Sweeper
+        return Sweeper(self.db, metrics=self.metrics)
+
+    def start_background(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        # Opening the database and recovering stale jobs happen off the startup path.
+        threading.Thread(target=self._start_background, name="services-start", daemon=True).start()
+
+    def _start_background(self):
+        try:
+            if self.job_queue.workers:
+                self.job_queue.start()
+            self.sweeper.start()
+        except Exception:
+            logger.exception("Failed to start background workers.")
+
+    def stop_background(self, timeout=None):
+        if self.is_built("job_queue"):
+            self.job_queue.stop(timeout)
+        if self.is_built("sweeper"):
+            self.sweeper.stop(timeout)
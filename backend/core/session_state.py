@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class SessionStateStore:
+    def __init__(self, max_finished=None, idle_seconds=None):
+        self.max_finished = max_finished if max_finished is not None else int(os.getenv("SESSION_STATE_MAX_FINISHED", "1000"))
+        self.idle_seconds = idle_seconds if idle_seconds is not None else int(os.getenv("SESSION_STATE_IDLE_SECONDS", "3600"))
+        # Both are kept in eviction order: active sessions by last update, finished ones by when they finished.
+        self._active = OrderedDict()
+        self._finished = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, session_id, description, level, progress="in_progress", actions=None, deltas=False):
+        state = {
+            "session_id": session_id,
+            "actions": list(actions or []),
+            "description": description,
+            "level": level,
+            "progress": progress,
+            "course_id": None,
+            "seq": 0,
+            "deltas": deltas,
+            "updated_at": time.monotonic(),
+        }
+        with self._lock:
+            self._finished.pop(session_id, None)
+            self._active.pop(session_id, None)
+            self._store(state)
+            self._evict()
+        return self._snapshot(state)
+
+    def update(self, session_id, actions=None, progress=None, course_id=None):
+        with self._lock:
+            state = self._get(session_id)
+            if state is None:
+                return None
+
+            state["seq"] += 1
+            state["updated_at"] = time.monotonic()
+            delta = {"session_id": session_id, "seq": state["seq"]}
+            if actions:
+                state["actions"].extend(actions)
+                delta["actions"] = list(actions)
+            if progress and progress != state["progress"]:
+                state["progress"] = progress
+                delta["progress"] = progress
+            if course_id and course_id != state["course_id"]:
+                state["course_id"] = course_id
+                delta["course_id"] = course_id
+            if session_id in self._active or "progress" in delta:
+                self._active.pop(session_id, None)
+                self._finished.pop(session_id, None)
+                self._store(state)
+            self._evict()
+            return delta
+
+    def discard_in_progress(self, session_id):
+        with self._lock:
+            return self._active.pop(session_id, None) is not None
+
+    def wants_deltas(self, session_id) -> bool:
+        with self._lock:
+            state = self._get(session_id)
+            return bool(state and state["deltas"])
+
+    def snapshot(self, session_id):
+        with self._lock:
+            state = self._get(session_id)
+            return self._snapshot(state) if state else None
+
+    def _get(self, session_id):
+        return self._active.get(session_id) or self._finished.get(session_id)
+
+    def _store(self, state):
+        if state["progress"] == "in_progress":
+            self._active[state["session_id"]] = state
+        else:
+            self._finished[state["session_id"]] = state
+
+    def _snapshot(self, state):
+        snapshot = {key: value for key, value in state.items() if key not in ("deltas", "updated_at")}
+        snapshot["actions"] = list(state["actions"])
+        return snapshot
+
+    def _evict(self):
+        # A worker that died mid-course never reports a final progress, so idle active sessions expire.
+        idle_since = time.monotonic() - self.idle_seconds
+        while self._active and next(iter(self._active.values()))["updated_at"] < idle_since:
+            self._active.popitem(last=False)
+        while len(self._finished) > self.max_finished:
+            self._finished.popitem(last=False)
@@ -0,0 +1,44 @@
+import json
+import time
+
+from core.database.initialise import LATEST_VERSION
+
+EXPORT_FORMAT = "quip-export"
+EXPORT_VERSION = 1
+
+
+def export_lines(db, course_ids=None):
+    header = {
+        "type": "header",
+        "format": EXPORT_FORMAT,
+        "version": EXPORT_VERSION,
+        "schema_version": LATEST_VERSION,
+        "exported_at": int(time.time()),
+    }
+    yield json.dumps(header) + "\n"
+    for record in db.iter_export(course_ids):
+        yield json.dumps(record) + "\n"
+
+
+def parse_lines(lines):
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Line {number} is not valid JSON: {e}")
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {number} is not a JSON object")
+        if record.get("type") == "header":
+            if record.get("format") != EXPORT_FORMAT or record.get("version", 0) > EXPORT_VERSION:
+                raise ValueError(f"Unsupported export format {record.get('format')} v{record.get('version')}")
+            continue
+        yield record
+
+
+def import_lines(db, lines, batch_size=None):
+    return db.import_records(parse_lines(lines), batch_size=batch_size)
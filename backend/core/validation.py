@@ -0,0 +1,88 @@
+import logging
+import re
+import threading
+from typing import Optional
+
+from core.llm_scheduler import LLMScheduler, PRIORITY_VALIDATION
+from core.metrics import Metrics
+from core.models import CourseAuthenticator
+
+logger = logging.getLogger(__name__)
+
+MAX_FAST_PATH_LENGTH = 500
+
+# Only unmistakable small talk is rejected locally; short topics such as "Go", "R" or "AI" go to the LLM.
+CHAT_PATTERNS = re.compile(
+    r"^(hi+|hey+|hello+|yo|sup|ok(ay)?|thanks?( you)?|thank you|bye|good (morning|evening|night)"
+    r"|how are you|what'?s up|who are you|lol|asdf\w*|qwerty\w*)[\s!?.]*$"
+)
+
+# Accepting locally needs a phrase asking for a course, not just a word like "learning".
+COURSE_INTENT_PATTERNS = re.compile(
+    r"\b((a |an )?(course|curriculum|syllabus|tutorial|lessons?|crash course|masterclass) (on|about|in|for|covering)"
+    r"|teach me|(i want|i'?d like|help me|want) to learn|learn (about|how to)"
+    r"|introduction to|intro to|basics of|fundamentals of|guide to|\w+ 101)\b"
+)
+
+NEGATION_PATTERNS = re.compile(r"\b(not?|don'?t|never|hate|stop|without)\b")
+
+
+def prefilter_course_request(description: str) -> Optional[bool]:
+    text = (description or "").strip().lower()
+
+    if not re.search(r"[a-z]", text):
+        return False
+    if CHAT_PATTERNS.match(text):
+        return False
+    if len(text) <= MAX_FAST_PATH_LENGTH and COURSE_INTENT_PATTERNS.search(text) and not NEGATION_PATTERNS.search(text):
+        return True
+    return None
+
+
+class CourseRequestValidator:
+    def __init__(self, agent, cache, metrics=None, scheduler=None):
+        self.agent = agent
+        self.cache = cache
+        self.metrics = metrics or Metrics(enabled=False)
+        self.scheduler = scheduler or LLMScheduler(metrics=self.metrics)
+        self._lock = threading.Lock()
+        self.stats = {"prefilter_accepts": 0, "prefilter_rejects": 0, "cache_hits": 0, "llm_calls": 0}
+
+    def _count(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def check(self, description: str) -> Optional[bool]:
+        verdict = prefilter_course_request(description)
+        if verdict is not None:
+            self._count("prefilter_accepts" if verdict else "prefilter_rejects")
+            return verdict
+
+        verdict = self.cache.get_verdict(description)
+        if verdict is not None:
+            self._count("cache_hits")
+        return verdict
+
+    def validate(self, description: str) -> bool:
+        verdict = self.check(description)
+        if verdict is not None:
+            return verdict
+        return self.validate_with_llm(description)
+
+    def validate_with_llm(self, description: str) -> bool:
+        self._count("llm_calls")
+        def call():
+            with self.metrics.llm_call("validator") as usage:
+                response = self.agent.deep_copy().run(description)
+                usage["metrics"] = response.metrics
+            return response
+
+        response = self.scheduler.call("validator", call, PRIORITY_VALIDATION, prompt=description)
+        course_validation: CourseAuthenticator = response.content
+        verdict = course_validation.is_valid_course_request
+        self.cache.set_verdict(description, verdict)
+        return verdict
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
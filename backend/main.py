@@ -1,67 +1,134 @@
+import json
 import logging
 import os
-from flask import Flask, request, jsonify
-from flask_socketio import SocketIO, Namespace, emit
+from flask import Blueprint, Flask, Response, current_app, request, jsonify
+from flask_socketio import SocketIO, Namespace, emit, join_room, leave_room
 import uuid
-import time
-from core.models import CourseOutline, CourseAuthenticator
-from core.prompts import SYSTEM_PROMPT_CONTENT, SYSTEM_PROMPT_OUTLINE
-from core.database.db import Database
+from core.database.search import search_terms, to_fts_query
+from core.http_cache import make_etag
+from core.events import message_queue_options, session_room
+from core.jobs import QueueFullError
+from core.services import Services
+from core.transfer import export_lines, import_lines
 from flask_cors import CORS
 from dotenv import load_dotenv
-from agno.agent import Agent
-from agno.models.google import Gemini
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 load_dotenv()
-app = Flask(__name__)
-CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+api = Blueprint("api", __name__)
+socketio = SocketIO()
+services = Services(socketio)
 
-db = Database()
+STREAM_SECTIONS = os.getenv("STREAM_SECTIONS", "false").lower() == "true"
+SESSION_DELTAS = os.getenv("SESSION_DELTAS", "false").lower() == "true"
 
-@app.route('/')
+MAX_PAGE_SIZE = 500
+MAX_COMPLETE_BATCH = 1000
+
+def parse_list_args():
+    fields = request.args.get('fields')
+    fields = [field.strip() for field in fields.split(',') if field.strip()] if fields else None
+
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+    try:
+        limit = int(limit) if limit is not None else None
+        after = int(after) if after is not None else None
+    except ValueError:
+        raise ValueError("'limit' and 'after' must be integers")
+    if limit is not None and not (1 <= limit <= MAX_PAGE_SIZE):
+        raise ValueError(f"'limit' must be between 1 and {MAX_PAGE_SIZE}")
+    if after is not None and limit is None:
+        limit = MAX_PAGE_SIZE
+    return limit, after, fields
+
+def versioned_json(scope, build, not_found=None):
+    version = services.db.get_data_version(scope)
+    key = request.full_path
+    etag = make_etag(key, scope, version)
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    body = services.http_cache.get(key, version)
+    if body is None:
+        payload = build()
+        if payload is None and not_found:
+            return jsonify({"error": not_found}), 404
+        body = current_app.json.dumps(payload)
+        services.http_cache.set(key, version, body)
+
+    response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    return response
+
+@api.route('/')
 def home():
-    db.health_check()
+    services.db.health_check()
     return {"message": "Hello from Flask!"}
 
-@app.route('/course', methods=["GET", "DELETE"])
+@api.route('/course', methods=["GET", "DELETE"])
 def course_handler():
     course_id = request.args.get('id')
     if not course_id:
         return jsonify({"error": "Missing 'id' query parameter"}), 400
 
     if request.method == "GET":
-        course = db.get_course(course_id)
-        if course:
-            return jsonify(course)
-        else:
-            return jsonify({"error": "Course not found"}), 404
+        return versioned_json(f"course:{course_id}", lambda: services.db.get_course(course_id), not_found="Course not found")
 
     elif request.method == "DELETE":
-        deleted = db.delete_course(course_id)
+        deleted = services.db.delete_course(course_id)
         if deleted:
             return jsonify({"message": f"Course with id {course_id} deleted successfully."}), 200
         else:
             return jsonify({"error": "Course not found"}), 404
 
-@app.route('/courses')
+@api.route('/courses')
 def get_all_courses():
-    courses = db.get_all_courses()
-    return jsonify(courses)
-
-@app.route('/sections')
+    try:
+        limit, after, fields = parse_list_args()
+        if limit is None:
+            return versioned_json("global", lambda: services.db.get_all_courses(fields=fields))
+        return versioned_json("global", lambda: services.db.get_courses_page(limit, after=after, fields=fields))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@api.route('/sections')
 def get_sections():
     course_id = request.args.get('course_id')
     if not course_id:
         return jsonify({"error": "Missing 'course_id' query parameter"}), 400
 
-    sections = db.get_all_sections_for_course(course_id)
-    return jsonify(sections)
-
-@app.route('/section/complete', methods=['POST'])
+    try:
+        limit, after, fields = parse_list_args()
+        scope = f"course:{course_id}"
+        if limit is None:
+            return versioned_json(scope, lambda: services.db.get_all_sections_for_course(course_id, fields=fields))
+        return versioned_json(scope, lambda: services.db.get_sections_page(course_id, limit, after=after, fields=fields))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+@api.route('/search')
+def search():
+    kind = request.args.get('kind')
+    if kind not in (None, 'course', 'section'):
+        return jsonify({"error": "'kind' must be 'course' or 'section'"}), 400
+    try:
+        text = request.args.get('q', '')
+        match_query = to_fts_query(text)
+        limit = int(request.args.get('limit', 20))
+        offset = int(request.args.get('offset', 0))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not (1 <= limit <= 100) or offset < 0:
+        return jsonify({"error": "'limit' must be between 1 and 100 and 'offset' non-negative"}), 400
+
+    return versioned_json("global", lambda: services.db.search(match_query, search_terms(text), limit, offset=offset, kind=kind))
+
+@api.route('/section/complete', methods=['POST'])
 def complete_section():
     try:
         data = request.get_json()
@@ -70,7 +137,7 @@ def complete_section():
         if not section_id:
             return jsonify({"error": "Missing 'section_id' in request body"}), 400
 
-        db.complete_section(section_id)
+        services.db.complete_section(section_id)
         return jsonify({"status": "success", "message": f"Section {section_id} marked as complete"}), 200
 
     except Exception as e:
@@ -78,112 +145,217 @@ def complete_section():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
-@app.route('/analytics')
+@api.route('/sections/complete', methods=['POST'])
+def complete_sections():
+    data = request.get_json(silent=True) or {}
+    section_ids = data.get('section_ids')
+    if not isinstance(section_ids, list) or not section_ids or not all(isinstance(i, str) for i in section_ids):
+        return jsonify({"error": "'section_ids' must be a non-empty list of section ids"}), 400
+    if len(section_ids) > MAX_COMPLETE_BATCH:
+        return jsonify({"error": f"At most {MAX_COMPLETE_BATCH} sections can be completed per request"}), 400
+
+    try:
+        result = services.db.complete_sections(section_ids)
+    except Exception as e:
+        logger.exception("Failed to complete sections.")
+        return jsonify({"status": "error", "message": str(e)}), 500
+    return jsonify({"status": "success", **result}), 200
+
+
+@api.route('/analytics')
 def get_analytics():
     try:
-        analytics_data = db.get_analytics_data()
-        return jsonify(analytics_data), 200
+        return versioned_json("global", services.db.get_analytics_data)
     except Exception as e:
         logger.exception("Failed to retrieve analytics data.")
         return jsonify({"error": "Failed to retrieve analytics data", "details": str(e)}), 500
 
+@api.route('/job')
+def get_job():
+    job_id = request.args.get('id')
+    if not job_id:
+        return jsonify({"error": "Missing 'id' query parameter"}), 400
 
-outline_agent = Agent(
-    model=Gemini(id=os.getenv("GEMINI_MODEL"), api_key=os.getenv("GEMINI_API_KEY")),
-    description=SYSTEM_PROMPT_OUTLINE,
-    introduction=SYSTEM_PROMPT_OUTLINE,
-    structured_outputs=True,
-    use_json_mode=True,
-    response_model= CourseOutline
-)
-
-course_validator = Agent(
-    model=Gemini(id=os.getenv("GEMINI_MODEL"), api_key=os.getenv("GEMINI_API_KEY")),
-    description="You are a course validator. Your task is to determine if the given course request is valid or a random chat message. Respond with 'true' if it is a valid course request and 'false' if it is not.",
-    instructions="Please respond with 'true' or 'false'. Send true if the given text is a valid request for making a course or description of a course and false if it is not.",
-    structured_outputs=True,
-    use_json_mode=True,
-    response_model= CourseAuthenticator
-)
-
-section_agent = Agent(
-    model=Gemini(id=os.getenv("GEMINI_MODEL"), api_key=os.getenv("GEMINI_API_KEY")),
-    description=SYSTEM_PROMPT_CONTENT,
-    introduction=SYSTEM_PROMPT_CONTENT
-)
-class CreateNamespace(Namespace):
-    def emit_session_update(self, session_id, course_id = None):
-        session = db.get_session(session_id)
-        self.emit('session_update', {**session, "course_id": course_id}, namespace='/create')
+    job = services.db.get_job(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    if job["status"] == "queued":
+        job["position"] = services.db.get_job_queue_position(job_id)
+    return jsonify(job)
+
+@api.route('/jobs/stats')
+def get_job_stats():
+    return jsonify(services.job_queue.get_stats())
+
+@api.route('/metrics')
+def get_metrics():
+    return Response(services.metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@api.route('/session/metrics')
+def get_session_metrics():
+    session_id = request.args.get('session_id')
+    if not session_id:
+        return jsonify({"error": "Missing 'session_id' query parameter"}), 400
+
+    records = services.db.get_session_metrics(session_id)
+    stages = {}
+    for record in records:
+        stage = stages.setdefault(record["stage"], {"count": 0, "duration_ms": 0.0, "input_tokens": 0, "output_tokens": 0})
+        stage["count"] += 1
+        stage["duration_ms"] += record["duration_ms"] or 0
+        stage["input_tokens"] += record["input_tokens"]
+        stage["output_tokens"] += record["output_tokens"]
+    return jsonify({"session_id": session_id, "stages": stages, "records": records})
+
+@api.route('/batch', methods=['POST'])
+def create_batch():
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        lines = [json.dumps(item) for item in data.get('items', [])]
+        parallelism = data.get('parallelism')
+    else:
+        lines = request.get_data(as_text=True).splitlines()
+        parallelism = request.args.get('parallelism', type=int)
+
+    from core.batch import parse_manifest
+
+    entries, errors = parse_manifest(lines)
+    if not entries:
+        return jsonify({"error": "Manifest contains no valid entries", "invalid_lines": errors}), 400
+
+    batch = services.batch_runner.create_batch(entries, batch_id=request.args.get('batch_id'))
+    try:
+        job = services.job_queue.enqueue("create_batch", {"batch_id": batch["batch_id"], "parallelism": parallelism})
+    except QueueFullError as e:
+        return jsonify({"error": str(e), **batch}), 503
+    return jsonify({**batch, "job_id": job["job_id"], "invalid_lines": errors}), 202
+
+@api.route('/batch')
+def get_batch():
+    batch_id = request.args.get('id')
+    if not batch_id:
+        return jsonify({"error": "Missing 'id' query parameter"}), 400
 
-    def emit_error(self, session_id, error_message):
-        self.emit('error', {"session_id": session_id, "error": error_message}, namespace='/create')
+    report = services.batch_runner.get_report(batch_id, status=request.args.get('status'))
+    if report is None:
+        return jsonify({"error": "Batch not found"}), 404
+    return jsonify(report)
+
+@api.route('/export')
+def export_courses():
+    course_ids = request.args.getlist('course_id') or None
+    return Response(
+        export_lines(services.db, course_ids),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=quip-export.ndjson"}
+    )
+
+@api.route('/import', methods=['POST'])
+def import_courses():
+    try:
+        stats = import_lines(services.db, request.stream, batch_size=request.args.get('batch_size', type=int))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"status": "success", **stats})
+
+@api.route('/maintenance', methods=['GET', 'POST'])
+def maintenance():
+    if request.method == 'POST':
+        return jsonify({"status": "success", **services.sweeper.sweep()})
+    return jsonify(services.sweeper.get_stats())
+
+@api.route('/cache/stats')
+def get_cache_stats():
+    validator = services.request_validator.get_stats() if services.is_built("request_validator") else None
+    return jsonify({**services.response_cache.get_stats(), "validator": validator})
+
+@api.route('/llm/stats')
+def get_llm_stats():
+    return jsonify(services.llm_scheduler.get_stats())
 
+class CreateNamespace(Namespace):
     def on_connect(self):
         print("Client connected to /create")
 
     def on_disconnect(self):
         print("Client disconnected from /create")
 
+    def on_join_session(self, data):
+        session_id = data.get('session_id')
+        if not session_id:
+            emit('error', {"session_id": None, "error": "Missing 'session_id'"})
+            return
+        join_room(session_room(session_id))
+
+    def on_leave_session(self, data):
+        session_id = data.get('session_id')
+        if session_id:
+            leave_room(session_room(session_id))
+
+    def on_get_session_snapshot(self, data):
+        session_id = data.get('session_id')
+        if not session_id:
+            emit('error', {"session_id": None, "error": "Missing 'session_id'"})
+            return
+        join_room(session_room(session_id))
+        services.events.emit_session_snapshot(session_id)
+
     def on_start_creation(self, data):
         session_id = data.get('session_id') or str(uuid.uuid4())
-        description = data.get('description', '')
-        level = data.get('level', '')
-
-        validator_response = course_validator.run(description)
-        course_validation: CourseAuthenticator = validator_response.content
-        if not course_validation.is_valid_course_request:
-            error_message = "Invalid course description. Please provide a valid course request."
-            self.emit_error(session_id, error_message)
+        join_room(session_room(session_id))
+        payload = {
+            "session_id": session_id,
+            "description": data.get('description', ''),
+            "level": data.get('level', ''),
+            "stream": bool(data.get('stream', STREAM_SECTIONS)),
+            "deltas": bool(data.get('deltas', SESSION_DELTAS)),
+        }
+        self.enqueue_creation(session_id, payload)
+
+    def on_resume_creation(self, data):
+        session_id = data.get('session_id')
+        session = services.db.get_session(session_id) if session_id else None
+        if session is None:
+            emit('error', {"session_id": session_id, "error": "Session not found"})
+            return
+        join_room(session_room(session_id))
+        if session["progress"] == 'success':
+            services.events.emit_session_snapshot(session_id)
+            return
+
+        job = services.db.get_active_job_for_session(session_id)
+        if job:
+            services.events.emit_job_update(job)
             return
-        actions = []
-        course_id = str(uuid.uuid4())
-
-        db.create_session(session_id, actions, description, level, 'in_progress')
-        self.emit_session_update(session_id)
-
-        actions.append("Creating course details")
-        db.update_session_progress(session_id, 'in_progress')
-        db.update_session_actions(session_id, actions)
-
-        self.emit_session_update(session_id)
-
-        response = outline_agent.run(f"Course Description: {description} \n\n Level: {level}")
-        course_outline: CourseOutline = response.content
-
-        created_at = int(time.time())
-        db.create_course(course_id, session_id, course_outline.course_title, course_outline.course_description, level, created_at)
-        actions.append(f"Course outline created")
-        db.update_session_actions(session_id, actions)
-        self.emit_session_update(session_id, course_id)
-        for i, section in enumerate(course_outline.sections):
-            actions.append(f"Creating section: {section.section_title}")
-            db.update_session_actions(session_id, actions)
-            self.emit_session_update(session_id, course_id)
-
-            section_response = section_agent.run(section.section_description)
-            section_content = section_response.content
-            section_id = str(uuid.uuid4())
-            db.create_section(
-                section_id=section_id,
-                course_id=course_id,
-                title=section.section_title,
-                description=section.section_description,
-                content=section_content,
-                section_order=i,
-                created_at=created_at
-            )
-
-            db.update_session_actions(session_id, actions)
-            self.emit_session_update(session_id, course_id)
-
-        actions.append("Course creation completed!")
-        db.update_session_progress(session_id, 'success')
-        db.update_session_actions(session_id, actions)
-
-        self.emit_session_update(session_id, course_id)
+
+        payload = {
+            "session_id": session_id,
+            "description": session["description"],
+            "level": session["level"],
+            "stream": bool(data.get('stream', STREAM_SECTIONS)),
+            "deltas": bool(data.get('deltas', SESSION_DELTAS)),
+        }
+        self.enqueue_creation(session_id, payload)
+
+    def enqueue_creation(self, session_id, payload):
+        try:
+            # Only the histogram: the job may run in another process, and nothing here would pop a session record.
+            with services.metrics.span("enqueue", record=False):
+                services.job_queue.enqueue("create_course", payload, session_id=session_id)
+        except QueueFullError:
+            services.events.emit_error(session_id, "The server is busy creating other courses. Please try again shortly.")
 
 socketio.on_namespace(CreateNamespace('/create'))
 
+
+def create_app():
+    app = Flask(__name__)
+    CORS(app, expose_headers=["ETag"])
+    app.register_blueprint(api)
+    socketio.init_app(app, cors_allowed_origins="*", **message_queue_options())
+    services.start_background()
+    return app
+
+
 if __name__ == '__main__':
-    socketio.run(app, debug=True, port=8000)
+    socketio.run(create_app(), debug=True, port=8000)
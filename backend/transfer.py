@@ -0,0 +1,44 @@
+"""Export or import courses as NDJSON.
+
+Usage (from backend/):
+    python transfer.py export backup.ndjson [--course-id ID ...]
+    python transfer.py import backup.ndjson
+
+Works directly on DB_PATH, so the server does not need to be running.
+Export streams one course at a time from a single read snapshot. Import
+inserts in batches of IMPORT_BATCH_SIZE records and skips rows that
+already exist. It then indexes the new courses for search and rebuilds
+the analytics rollups.
+"""
+import argparse
+import json
+import sys
+
+from core.database.db import Database
+from core.transfer import export_lines, import_lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path", help="NDJSON file, or - for stdout/stdin")
+    parser.add_argument("--course-id", action="append", help="export only these courses")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+
+    db = Database()
+    if args.command == "export":
+        out = sys.stdout if args.path == "-" else open(args.path, "w")
+        with out:
+            out.writelines(export_lines(db, args.course_id))
+        return 0
+
+    source = sys.stdin if args.path == "-" else open(args.path)
+    with source:
+        stats = import_lines(db, source, batch_size=args.batch_size)
+    print(json.dumps(stats), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
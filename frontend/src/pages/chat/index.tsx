@@ -26,6 +26,7 @@ function Chat() {
   const [isDeleting, setIsDeleting] = useState<boolean>(false);
 
   const socketRef = useRef<Socket | null>(null);
+  const sessionIdRef = useRef<string | null>(null);
   const API_BASE_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
 
   const scrollToBottom = useCallback(() => {
@@ -38,9 +39,15 @@ function Chat() {
   useEffect(() => {
     socketRef.current = io(`${API_BASE_URL}/create`);
 
-    socketRef.current.on("connect", () =>
-      console.log("Connected to WebSocket server")
-    );
+    socketRef.current.on("connect", () => {
+      console.log("Connected to WebSocket server");
+      // Events are only sent to the session's room, which has to be joined again after every reconnect.
+      if (sessionIdRef.current) {
+        socketRef.current!.emit("join_session", {
+          session_id: sessionIdRef.current,
+        });
+      }
+    });
     socketRef.current.on("disconnect", () =>
       console.log("Disconnected from WebSocket server")
     );
@@ -109,7 +116,7 @@ function Chat() {
     return () => {
       if (socketRef.current) socketRef.current.disconnect();
     };
-  }, [API_BASE_URL, course]);
+  }, [API_BASE_URL]);
 
   const fetchCourseData = async (courseId: string) => {
     if (!courseId) {
@@ -177,8 +184,10 @@ function Chat() {
     setError(null);
     setCourse(null);
     setSections([]);
+    const sessionId = crypto.randomUUID();
+    sessionIdRef.current = sessionId;
     setSession({
-      session_id: crypto.randomUUID(),
+      session_id: sessionId,
       description: trimmedDescription,
       level: selectedLevel,
       progress: "in_progress",
@@ -186,6 +195,7 @@ function Chat() {
     });
 
     socketRef.current!.emit("start_creation", {
+      session_id: sessionId,
       description: trimmedDescription,
       level: selectedLevel,
     });
@@ -210,6 +220,7 @@ function Chat() {
   };
 
   const resetStateForNewAttempt = () => {
+    sessionIdRef.current = null;
     setError(null);
     setSession(null);
     setUserInputDescription("");